@@ -0,0 +1,114 @@
+import json
+import os
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# ---------------------- Aging Engine ----------------------
+# Outstanding amounts bucketed by days past due, for any number of as-of dates
+# in one vectorized pass. Inputs are columnar NumPy arrays (one entry per
+# invoice, or per aggregated rollup row with its summed amount). An entry is
+# outstanding on an as-of date when it was issued by then and not yet closed.
+#
+#   AGING_BUCKETS="30,60,90"             -> Not Due, 0–30, 31–60, 61–90, 90+
+#   SUPPLIER_CREDIT_TERMS='{"ABC": 45}'  -> ABC invoices fall due 45 days after invoice_date
+
+AGING_EDGES = (0, *(int(days) for days in os.getenv("AGING_BUCKETS", "30,60,90").split(",")))
+CREDIT_TERMS = json.loads(os.getenv("SUPPLIER_CREDIT_TERMS", "{}"))
+
+# Caps the (as-of dates x entries) working arrays
+BLOCK_CELLS = 2_000_000
+
+
+def bucket_labels(edges=AGING_EDGES):
+    labels = ["Not Due"]
+    for i in range(1, len(edges)):
+        low = edges[i - 1] if i == 1 else edges[i - 1] + 1
+        labels.append(f"{low}–{edges[i]}")
+    labels.append(f"{edges[-1]}+")
+    return labels
+
+
+def to_days(values):
+    # Dates/strings -> datetime64[D], unparseable or empty -> NaT
+    return pd.to_datetime(pd.Series(values, dtype=object), errors="coerce").to_numpy("datetime64[D]")
+
+
+@dataclass(frozen=True)
+class AgingInputs:
+    supplier: np.ndarray      # str
+    invoice_date: np.ndarray  # datetime64[D], NaT = issued before any as-of date
+    due_date: np.ndarray      # datetime64[D], NaT = can't be aged
+    closed_date: np.ndarray   # datetime64[D], NaT = still open
+    amount: np.ndarray        # float
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(
+            supplier=df["supplier_name"].fillna("").astype(str).to_numpy(),
+            invoice_date=to_days(df["invoice_date"]),
+            due_date=to_days(df["due_date"]),
+            closed_date=to_days(df["closed_date"]),
+            amount=pd.to_numeric(df["amount"], errors="coerce").fillna(0).to_numpy(float)
+        )
+
+
+def apply_credit_terms(inputs, terms=CREDIT_TERMS):
+    # Suppliers with configured terms are due invoice_date + terms; the rest keep their stated due date
+    if not terms or not len(inputs.supplier):
+        return inputs.due_date
+    suppliers, inverse = np.unique(inputs.supplier, return_inverse=True)
+    term_days = np.array([terms.get(s, -1) for s in suppliers])[inverse]
+    has_terms = (term_days >= 0) & ~np.isnat(inputs.invoice_date)
+    computed = inputs.invoice_date + np.maximum(term_days, 0).astype("timedelta64[D]")
+    return np.where(has_terms, computed, inputs.due_date)
+
+
+def compute_aging(inputs, as_of_dates, edges=AGING_EDGES, terms=CREDIT_TERMS):
+    # Returns a (len(as_of_dates), len(edges) + 1) array of outstanding amounts.
+    # Bucket 0 is not yet due; bucket i holds days past due in (edges[i-1], edges[i]].
+    as_of = to_days(as_of_dates)[:, None]
+    due = apply_credit_terms(inputs, terms)
+    n_buckets = len(edges) + 1
+    totals = np.zeros(len(as_of) * n_buckets)
+    row_offsets = np.arange(len(as_of))[:, None] * n_buckets
+
+    block = max(1, BLOCK_CELLS // max(1, len(as_of)))
+    for start in range(0, len(due), block):
+        part = slice(start, start + block)
+        # NaT compares False, so missing invoice/closed dates never exclude an entry
+        open_ = (~np.isnat(due[part]) & ~(inputs.invoice_date[part] > as_of)
+                 & ~(inputs.closed_date[part] <= as_of))
+        days_past_due = (as_of - due[part]).astype(np.int64)
+        cells = np.searchsorted(edges, days_past_due, side="left") + row_offsets
+        weights = np.broadcast_to(inputs.amount[part], open_.shape)
+        totals += np.bincount(cells[open_], weights=weights[open_], minlength=totals.size)
+    return totals.reshape(len(as_of), n_buckets)
+
+
+def aging_frame(inputs, as_of_dates, edges=AGING_EDGES, terms=CREDIT_TERMS):
+    return pd.DataFrame(
+        compute_aging(inputs, as_of_dates, edges, terms),
+        index=pd.DatetimeIndex(as_of_dates, name="as_of"), columns=bucket_labels(edges)
+    )
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_aging_frame(data_version, as_of_dates, edges, terms, _inputs):
+    # _inputs is left out of the cache key; data_version stands in for it
+    return aging_frame(_inputs, list(as_of_dates), edges, dict(terms))
+
+
+def aging_report(inputs, as_of_dates, data_version=None, edges=AGING_EDGES, terms=CREDIT_TERMS):
+    # Memoized per data version; without one (data not from the mirror) it is recomputed
+    as_of_dates = tuple(pd.Timestamp(d).normalize() for d in as_of_dates)
+    if data_version is None:
+        return aging_frame(inputs, list(as_of_dates), edges, terms)
+    return _cached_aging_frame(data_version, as_of_dates, tuple(edges), tuple(sorted(terms.items())), inputs)
+
+
+def month_ends(count, today=None):
+    # The last `count` completed month-ends, oldest first
+    month = pd.Timestamp(today or pd.Timestamp.today()).to_period("M")
+    return [period.end_time.normalize() for period in pd.period_range(end=month - 1, periods=count, freq="M")]
@@ -28,61 +28,68 @@ elif authentication_status:
     authenticator.logout("Logout", "sidebar")
     st.sidebar.success(f"Welcome {name}!")
     # 🔓 Place your entire app here (all tab logic, etc.)    
-    import pdfplumber
-    import requests
+    # ⚡ Shared by every tab. PDF parsing, OCR, extractors, the dashboard and the
+    # AI fallback are imported where they're used, so a cold start only pays
+    # for the tab being rendered (see benchmarks/import_time.py).
     import re
+    import requests
     import pandas as pd
     from datetime import datetime, date
-    import os
     from io import BytesIO
-    from supplier_extractors import SUPPLIER_EXTRACTORS, get_best_supplier_match
-    from dashboard import render_dashboard
-    from ai_extractor import ai_extract_invoice_fields
+    from extractor_registry import SUPPLIER_EXTRACTORS
+    from supabase_client import get_supabase
+    from bulk_ops import ChangeSet, apply_change_set, bulk_insert, set_invoice_status
+    from invoice_query import InvoiceQuery
+    from invoice_mirror import get_mirror, read_pages
+    from data_cache import cached_invoice_page, invalidate, select_rows, table_generation
+    from paged_editor import get_change_log, paged_editor, set_column
     
-    SUPABASE_URL = os.getenv("SUPABASE_URL")
-    SUPABASE_API_KEY = os.getenv("SUPABASE_API_KEY")
     TABLE_NAME = "invoices"
-    
-    def supabase_headers():
-        return {
-            "apikey": SUPABASE_API_KEY,
-            "Authorization": f"Bearer {SUPABASE_API_KEY}",
-            "Content-Type": "application/json"
-        }
+
+    # Columns each list tab actually displays (id is the editor/pagination key)
+    MANAGE_COLUMNS = ("id", "supplier_name", "company_name", "invoice_no", "invoice_date", "due_date",
+                      "amount", "reference", "remarks", "paid_date", "paid_via")
+    MARK_PAID_COLUMNS = ("supplier_name", "company_name", "invoice_no", "invoice_date", "due_date",
+                         "amount", "reference")
+    PAID_HISTORY_COLUMNS = ("supplier_name", "company_name", "invoice_no", "invoice_date", "due_date",
+                            "amount", "reference", "remarks", "paid_date", "paid_via")
+    supabase = get_supabase()
 
     def get_supplier_options(is_invoice):
-        # Filter supplier_names by extractor availability
+        # Filter supplier_names by extractor availability (cached until supplier_names changes)
         query_field = "has_invoice_extractor" if is_invoice else "has_soa_extractor"
-        url = f"{SUPABASE_URL}/rest/v1/supplier_names?select=name,{query_field}"
-        res = requests.get(url, headers=supabase_headers())
-        if res.status_code == 200:
-            return [row["name"] for row in res.json() if row.get(query_field)]
-        return []
+        try:
+            rows = select_rows("supplier_names", f"name,{query_field}")
+        except requests.RequestException:
+            return []
+        return [row["name"] for row in rows if row.get(query_field)]
     
     def get_dropdown_values(column, table):
-        url = f"{SUPABASE_URL}/rest/v1/{table}?select={column}"
-        response = requests.get(url, headers=supabase_headers())
-        if response.status_code == 200:
-            return sorted(set(row[column] for row in response.json() if row[column]))
-        return []
+        try:
+            rows = select_rows(table, column)
+        except requests.RequestException:
+            return []
+        return sorted(set(row[column] for row in rows if row[column]))
+
+    def invoices_changed():
+        # After our own writes: pull them into the mirror and drop cached invoice reads
+        get_mirror().expire()
+        invalidate(TABLE_NAME)
     
     def insert_batch_to_supabase(data_list):
-        url = f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}"
-        headers = supabase_headers()
-        headers["Prefer"] = "return=representation"
-        try:
-            response = requests.post(url, json=data_list, headers=headers)
-            
-            return response.status_code, response.json()
-        except Exception as e:
-            st.error(f"🔴 Request failed: {str(e)}")
-            return 500, {"error": str(e)}
+        # ⚡ Byte-sized chunks of idempotent upserts; returns one ChunkResult per chunk
+        from invoice_bloom import get_key_filter
+        results = bulk_insert(supabase, TABLE_NAME, data_list)
+        invoices_changed()
+        get_key_filter().add_rows(row for result in results if not result.error for row in result.rows)
+        return results
     
     
     def extract_invoice_data_from_pdf(file, supplier_name, company_name, is_invoice=True, use_ai=False):
+        from pdf_document import ParsedDocument, read_pdf_bytes
+        from extraction_cache import cached_extract
         
-        with pdfplumber.open(file) as pdf:
-            text = "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
+        data = read_pdf_bytes(file)
     
         is_soa = not is_invoice
         key = (supplier_name, is_soa)
@@ -93,11 +100,12 @@ elif authentication_status:
     
         if extractor:
             st.info(f"📌 Using extractor for: {supplier_name} ({'SOA' if is_soa else 'Invoice'})")
-            return extractor(file, supplier_name, company_name)
+            return cached_extract(data, extractor, supplier_name, company_name)
     
         if use_ai and not is_soa:
             st.warning("🤖 No extractor found. Trying AI-powered fallback...")
-            return ai_extract_invoice_fields(text, supplier_name, company_name)
+            from ai_extractor import ai_extract_invoice_fields
+            return ai_extract_invoice_fields(ParsedDocument.from_pdf(data).text, supplier_name, company_name)
     
         st.warning("⚠️ No matching extractor found and AI fallback is disabled.")
         return {
@@ -112,24 +120,60 @@ elif authentication_status:
 
 
     
-    def get_invoices_by_status(status):
-        url = f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}?status=eq.{status}&select=*"
-        response = requests.get(url, headers=supabase_headers())
-        return response.json() if response.status_code == 200 else []
+    def fetch_invoice_page(query, state_key):
+        # 📄 Keyset pages; cursors of earlier pages are kept to go back
+        cursors_key = f"{state_key}_cursors"
+        if st.session_state.get(f"{state_key}_query") != query:
+            st.session_state[f"{state_key}_query"] = query
+            st.session_state[cursors_key] = [None]
+        cursors = st.session_state[cursors_key]
+
+        try:
+            rows, next_cursor = cached_invoice_page(query, after=cursors[-1])
+        except requests.RequestException as e:
+            st.error(f"❌ Could not load invoices from Supabase: {e}")
+            return []
+
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        if len(cursors) > 1 and col_prev.button("⬅️ Previous", key=f"{state_key}_prev"):
+            cursors.pop()
+            st.rerun()
+        col_page.caption(f"Page {len(cursors)}")
+        if next_cursor is not None and col_next.button("Next ➡️", key=f"{state_key}_next"):
+            cursors.append(next_cursor)
+            st.rerun()
+        return rows
     
     def update_invoice_paid_fields(invoice_ids, paid_date, paid_via, remark, status="Paid"):
-        url = f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}"
-        headers = supabase_headers()
-        for inv_id in invoice_ids:
-            patch_url = f"{url}?invoice_no=eq.{inv_id}"
-            payload = {
-                "status": status,
-                "paid_date": paid_date,
-                "paid_via": paid_via,
-                "remarks": remark
-            }
-            requests.patch(patch_url, headers=headers, json=payload)
-        return True
+        # ⚡ One PATCH per URL-sized chunk of invoice ids, not per invoice
+        result = set_invoice_status(supabase, invoice_ids, status, paid_date, paid_via, remark)
+        invoices_changed()
+        return result
+
+    def display_date(value):
+        parsed = pd.to_datetime(value, errors="coerce")
+        return parsed.strftime("%d-%m-%Y") if pd.notnull(parsed) else ""
+
+    def select_page(key, rows):
+        # "Select all" ticks (or clears) every row of the page shown when it was toggled
+        set_column(key, rows, "select", st.session_state[f"select_all_{key}"], {"select": False})
+
+    def invoice_labels(log, row_ids):
+        # id -> "invoice no (supplier)", for reporting per-id results readably
+        return {str(i): f"{log.originals[i]['invoice_no']} ({log.originals[i]['supplier_name']})" for i in row_ids}
+
+    def show_bulk_result(result, labels=None):
+        labels = labels or {}
+        if result.missing:
+            st.warning(f"⚠️ No invoice found for: {', '.join(labels.get(k, k) for k in result.missing)}")
+        if result.failed:
+            first_error = next(iter(result.failed.values()))
+            failed = ", ".join(labels.get(k, k) for k in result.failed)
+            st.error(f"❌ Failed to update {len(result.failed)} invoice(s): {failed} ({first_error})")
+
+    def finish_bulk_update(log, selected_ids, result):
+        # Failed rows stay selected so they can be retried
+        log.discard([i for i in selected_ids if str(i) not in result.failed])
     
     st.sidebar.title("🧭 Navigation")
     if "selected_tab" not in st.session_state:
@@ -153,9 +197,15 @@ elif authentication_status:
     ].index(st.session_state["selected_tab"]), key="selected_tab")
     st.write(f"📍 Tab selected: {tab}")
 
+    # 📡 Connection health (counters are per server process)
+    with st.sidebar.expander("📡 Supabase Health"):
+        st.caption(f"Circuit: {supabase.breaker.state}")
+        st.json(supabase.stats.snapshot())
+
 
     
     if tab == "📊 Dashboard":
+        from dashboard import render_dashboard
         render_dashboard()
 
     
@@ -167,21 +217,68 @@ elif authentication_status:
         supplier_options = [""] + get_supplier_options(is_invoice)
         company_options = [""] + get_dropdown_values("name", "company_names")
 
-        supplier_name = st.selectbox("Select Supplier Name", supplier_options, index=0)
+        auto_detect = st.toggle("🔎 Auto-detect supplier per file", value=False)
+        supplier_name = st.selectbox("Select Supplier Name", supplier_options, index=0, disabled=auto_detect)
         company_name = st.selectbox("Select Company Name", company_options, index=0)
 
         uploaded_files = st.file_uploader("Upload PDF files", accept_multiple_files=True)
 
         if uploaded_files:
-            if not supplier_name or not company_name:
+            if (not supplier_name and not auto_detect) or not company_name:
                 st.warning("Please select both Supplier Name and Company Name before processing.")
             else:
+                from ingestion import ingest_files
+                from supplier_detection import detect_pdf_supplier
+                from dedup import find_duplicates
+
                 extracted_rows = []
+                pdf_files = []
                 for file in uploaded_files:
                     if not file.name.lower().endswith(".pdf"):
                         st.error(f"❌ Skipping invalid file: {file.name}. Only PDF files are allowed.")
                         continue
-                    extracted_data = extract_invoice_data_from_pdf(file, supplier_name, company_name, is_invoice, use_ai=use_ai)
+                    pdf_files.append(file)
+
+                is_soa = not is_invoice
+                ingest_results = None
+                if auto_detect:
+                    # 🔎 Mixed batch: group files by detected (supplier, is_soa)
+                    groups = {}
+                    for i, file in enumerate(pdf_files):
+                        data = file.getvalue()
+                        detected = detect_pdf_supplier(data, company_name)
+                        if detected is None:
+                            st.error(f"❌ Could not detect the supplier of {file.name}. Upload it with a supplier selected.")
+                            continue
+                        groups.setdefault(detected, []).append((i, file.name, data))
+
+                    by_position = {}
+                    for (detected_supplier, detected_soa), members in groups.items():
+                        st.info(f"📌 Detected {detected_supplier} ({'SOA' if detected_soa else 'Invoice'}): {len(members)} file(s)")
+                        batch = [(name, data) for _, name, data in members]
+                        for (i, _, _), result in zip(members, ingest_files(batch, detected_supplier, company_name, detected_soa)):
+                            by_position[i] = result
+                    ingest_results = [by_position[i] for i in sorted(by_position)]
+                elif (supplier_name, is_soa) in SUPPLIER_EXTRACTORS:
+                    # ⚡ Known extractor: fan files out across worker processes
+                    st.info(f"📌 Using extractor for: {supplier_name} ({'SOA' if is_soa else 'Invoice'})")
+                    batch = [(file.name, file.getvalue()) for file in pdf_files]
+                    ingest_results = ingest_files(batch, supplier_name, company_name, is_soa)
+
+                if ingest_results is not None:
+                    extracted_results = []
+                    for result in ingest_results:
+                        if result.error:
+                            st.error(f"❌ Failed to extract {result.name}: {result.error}")
+                        else:
+                            extracted_results.append(result.rows)
+                else:
+                    extracted_results = [
+                        extract_invoice_data_from_pdf(file, supplier_name, company_name, is_invoice, use_ai=use_ai)
+                        for file in pdf_files
+                    ]
+
+                for extracted_data in extracted_results:
                     # st.write("📎 Extracted Data:", extracted_data)
                     extracted_list = extracted_data if isinstance(extracted_data, list) else [extracted_data]
 
@@ -227,22 +324,14 @@ elif authentication_status:
                     valid_df = edited_df.dropna(subset=required_fields)
 
                     if not valid_df.empty:
-                        response = requests.get(
-                            f"{SUPABASE_URL}/rest/v1/invoices?select=invoice_no,invoice_date",
-                            headers=supabase_headers()
-                        )
-                        existing_keys = set()
-                        if response.status_code == 200:
-                            existing_data = response.json()
-                            existing_keys = {
-                                (item["invoice_no"], item["invoice_date"])
-                                for item in existing_data if item.get("invoice_no") and item.get("invoice_date")
-                            }
-
                         valid_df["invoice_date"] = pd.to_datetime(valid_df["invoice_date"], errors="coerce").dt.strftime("%Y-%m-%d")
-                        valid_df["is_duplicate"] = valid_df.apply(
-                            lambda r: (r["invoice_no"], r["invoice_date"]) in existing_keys, axis=1
-                        )
+
+                        # 🔎 Bloom pre-filter, then look up only possible duplicates
+                        try:
+                            valid_df["is_duplicate"] = find_duplicates(supabase, valid_df)
+                        except Exception as e:
+                            st.warning(f"⚠️ Duplicate check failed, all rows are treated as new: {e}")
+                            valid_df["is_duplicate"] = False
 
                         unique_df = valid_df[~valid_df["is_duplicate"]].drop(columns=["is_duplicate"])
                         duplicates_df = valid_df[valid_df["is_duplicate"]].drop(columns=["is_duplicate"])
@@ -256,15 +345,22 @@ elif authentication_status:
                                 cleaned = {k: (None if pd.isna(v) else v) for k, v in row.items()}
                                 cleaned_rows.append(cleaned)
                         
-                            status_code, response = insert_batch_to_supabase(cleaned_rows)
-                            # status_code, response = insert_batch_to_supabase(unique_df.to_dict(orient="records"))
-                            if status_code == 201:
-                                st.success("✅ Data saved to Supabase.")
-                                if not duplicates_df.empty:
-                                    dup_invoices = ", ".join(duplicates_df['invoice_no'].astype(str).unique())
-                                    st.warning(f"⚠️ Skipped {len(duplicates_df)} duplicate invoice(s): {dup_invoices}")
-                            else:
-                                st.error("❌ Failed to insert records.")
+                            chunk_results = insert_batch_to_supabase(cleaned_rows)
+                            failed_chunks = [result for result in chunk_results if result.error]
+                            inserted = sum(result.inserted for result in chunk_results)
+                            skipped = sum(result.skipped for result in chunk_results)
+                            if inserted:
+                                st.success(f"✅ Saved {inserted} invoice(s) to Supabase.")
+                            if skipped:
+                                st.info(f"📌 {skipped} invoice(s) were already in Supabase and were skipped.")
+                            if not duplicates_df.empty:
+                                dup_invoices = ", ".join(duplicates_df['invoice_no'].astype(str).unique())
+                                st.warning(f"⚠️ Skipped {len(duplicates_df)} duplicate invoice(s): {dup_invoices}")
+                            for i, result in enumerate(chunk_results, start=1):
+                                if result.error:
+                                    st.error(f"❌ Chunk {i}/{len(chunk_results)} ({len(result.rows)} rows) failed: {result.error}")
+                            if failed_chunks:
+                                st.info("🔁 Saving again is safe: rows that already landed are skipped.")
                         elif unique_df.empty:
                             st.info("📌 All uploaded invoices already exist. No new records to save.")
                     else:
@@ -302,163 +398,141 @@ elif authentication_status:
     if tab == "🛠️ Manage Invoices":
         st.title("🛠️ Manage Invoices")
     
-        # 🔄 Fetch all invoices
-        def fetch_all_invoices():
-            url = f"{SUPABASE_URL}/rest/v1/invoices?select=*"
-            res = requests.get(url, headers=supabase_headers())
-            return res.json() if res.status_code == 200 else []
-    
-        data = fetch_all_invoices()
+        # 🎯 Filters (applied by Supabase, one page at a time)
+        with st.expander("🔍 Filter Options", expanded=True):
+            col1, col2 = st.columns(2)
+            supplier_filter = col1.text_input("Filter by Supplier Name")
+            company_filter = col2.text_input("Filter by Company Name")
+            date_range = st.date_input("Filter by Invoice Date Range", [])
+
+        query = InvoiceQuery(
+            columns=MANAGE_COLUMNS,
+            supplier=supplier_filter,
+            company=company_filter,
+            date_from=date_range[0] if len(date_range) == 2 else None,
+            date_to=date_range[1] if len(date_range) == 2 else None
+        )
+        data = fetch_invoice_page(query, "manage")
+        log = get_change_log("manage")
     
         if not data:
             st.info("📭 No invoices found.")
         else:
-            df = pd.DataFrame(data)
-    
-            # 🎯 Filters
-            with st.expander("🔍 Filter Options", expanded=True):
-                col1, col2 = st.columns(2)
-                supplier_filter = col1.text_input("Filter by Supplier Name")
-                company_filter = col2.text_input("Filter by Company Name")
-                date_range = st.date_input("Filter by Invoice Date Range", [])
-    
-            if supplier_filter:
-                df = df[df["supplier_name"].str.contains(supplier_filter, case=False, na=False)]
-            if company_filter:
-                df = df[df["company_name"].str.contains(company_filter, case=False, na=False)]
-            if len(date_range) == 2:
-                df["invoice_date"] = pd.to_datetime(df["invoice_date"], errors="coerce")
-                df = df[
-                    (df["invoice_date"] >= pd.to_datetime(date_range[0])) &
-                    (df["invoice_date"] <= pd.to_datetime(date_range[1]))
-                ]
-    
-            # ✅ Prepare table
-            df["🗑️ Delete"] = False
-            df = df.drop(columns=["id", "created_at", "status"], errors="ignore")
+            # ✅ Only this page goes to the editor; edits on other pages stay in the change log
             editable_cols = ["amount", "due_date", "remarks", "🗑️ Delete"]
-    
-            cols = list(df.columns)
-            df = df[cols]
-    
-            edited = st.data_editor(
-                df,
-                key="manage_invoice_editor",
-                use_container_width=True,
-                num_rows="dynamic",
-                hide_index=True,
-                column_order=cols,
-                disabled=[col for col in cols if col not in editable_cols]
-            )
-    
-            # 🔄 Detect changes
-            changes = edited.compare(df, keep_shape=True, keep_equal=False)
-            modified_rows = changes.index.get_level_values(0).unique().tolist()
-    
-            to_update = edited.loc[modified_rows]
-            to_delete = edited[edited["🗑️ Delete"] == True]
-    
-            # 💾 Update changes
-            if not to_update.empty and st.button("💾 Save Updates"):
-                for _, row in to_update.iterrows():
-                    patch_url = f"{SUPABASE_URL}/rest/v1/invoices?invoice_no=eq.{row['invoice_no']}"
-                    payload = {
-                        "amount": float(row["amount"]) if row.get("amount") else None,
-                        "due_date": row["due_date"],
-                        "remarks": row.get("remarks")
-                    }
-                    requests.patch(patch_url, headers=supabase_headers(), json=payload)
-                st.success("✅ Updated selected invoice(s).")
-                st.rerun()
-    
-            # 🗑️ Delete selected rows
-            if not to_delete.empty and st.button("🗑️ Confirm Delete Selected"):
-                for _, row in to_delete.iterrows():
-                    delete_url = f"{SUPABASE_URL}/rest/v1/invoices?invoice_no=eq.{row['invoice_no']}"
-                    requests.delete(delete_url, headers=supabase_headers())
-                st.success(f"🗑️ Deleted {len(to_delete)} invoice(s).")
-                st.rerun()
+            cols = [col for col in MANAGE_COLUMNS if col != "id"] + ["🗑️ Delete"]
+            paged_editor(data, "manage", cols, editable_cols, defaults={"🗑️ Delete": False})
+            if log:
+                st.caption(f"✏️ Unsaved changes to {len(log)} invoice(s) across pages")
+    
+            # 🔄 Only rows touched in the editor are in the log
+            to_delete = set(log.ids_where("🗑️ Delete", True))
+
+            updates = ChangeSet()
+            for invoice_id in log.changes:
+                if invoice_id in to_delete:
+                    continue
+                amount = log.value(invoice_id, "amount")
+                updates.update(invoice_id, {
+                    "amount": float(amount) if amount else None,
+                    "due_date": log.value(invoice_id, "due_date"),
+                    "remarks": log.value(invoice_id, "remarks")
+                })
+
+            deletes = ChangeSet()
+            for invoice_id in to_delete:
+                deletes.delete(invoice_id)
+
+            def show_change_set_result(result, verb):
+                if result.applied:
+                    st.success(f"✅ {verb} {len(result.applied)} invoice(s).")
+                if result.conflicted:
+                    st.warning(f"⚠️ {len(result.conflicted)} invoice(s) were changed or removed by someone else and were skipped. Refresh and try again.")
+                if result.failed:
+                    first_error = next(iter(result.failed.values()))
+                    st.error(f"❌ Failed to apply {len(result.failed)} change(s): {first_error}")
+                # Failed changes stay in the log so saving again retries them
+                settled = set(result.applied) | set(result.conflicted)
+                log.discard([invoice_id for invoice_id in list(log.changes) if str(invoice_id) in settled])
+
+            # 💾 Update changes (one bulk upsert on id)
+            if updates and st.button("💾 Save Updates"):
+                result = apply_change_set(supabase, "invoices", updates, list(log.originals.values()))
+                invoices_changed()
+                show_change_set_result(result, "Updated")
+                if not result.failed and not result.conflicted:
+                    st.rerun()
+
+            # 🗑️ Delete selected rows (one id=in.(...) delete)
+            if deletes and st.button("🗑️ Confirm Delete Selected"):
+                result = apply_change_set(supabase, "invoices", deletes, list(log.originals.values()))
+                invoices_changed()
+                show_change_set_result(result, "Deleted")
+                if not result.failed and not result.conflicted:
+                    st.rerun()
 
 
 
     elif tab == "✅ Mark as Paid":
         st.title("✅ Mark Invoices as Paid")
     
-        data = get_invoices_by_status("Unpaid")
+        # Step 1: Initialize filter state
+        if "mark_supplier_filter" not in st.session_state:
+            st.session_state["mark_supplier_filter"] = ""
+        if "mark_company_filter" not in st.session_state:
+            st.session_state["mark_company_filter"] = ""
+        if "mark_date_range" not in st.session_state:
+            st.session_state["mark_date_range"] = []
+
+        # Step 2: Clear All Filters
+        if st.button("🧹 Clear All Filters"):
+            st.session_state.update({
+                "mark_supplier_filter": "",
+                "mark_company_filter": "",
+                "mark_date_range": []
+            })
+            st.rerun()
+
+        # Step 3: Filter Controls
+        with st.expander("🔍 Filter Options", expanded=True):
+            col1, col2 = st.columns(2)
+            supplier_filter = col1.text_input("🔍 Filter by Supplier", st.session_state.get("mark_supplier_filter", ""), key="mark_supplier_filter")
+            company_filter = col2.text_input("🏢 Filter by Company", st.session_state.get("mark_company_filter", ""), key="mark_company_filter")
+            date_range = st.date_input("📅 Filter by Invoice Date Range", st.session_state.get("mark_date_range", []), key="mark_date_range")
+
+        # Step 4: Fetch the filtered page from Supabase
+        query = InvoiceQuery(
+            columns=MARK_PAID_COLUMNS,
+            status="Unpaid",
+            supplier=supplier_filter,
+            company=company_filter,
+            date_from=date_range[0] if len(date_range) == 2 else None,
+            date_to=date_range[1] if len(date_range) == 2 else None
+        )
+        data = fetch_invoice_page(query, "mark_paid")
+        log = get_change_log("mark_paid")
+
         if not data:
             st.info("✅ No unpaid invoices found.")
         else:
-            df = pd.DataFrame(data)
-    
-            # Step 1: Initialize filter state
-            if "mark_supplier_filter" not in st.session_state:
-                st.session_state["mark_supplier_filter"] = ""
-            if "mark_company_filter" not in st.session_state:
-                st.session_state["mark_company_filter"] = ""
-            if "mark_date_range" not in st.session_state:
-                st.session_state["mark_date_range"] = []
-    
-            # Step 2: Clear All Filters
-            if st.button("🧹 Clear All Filters"):
-                st.session_state.update({
-                    "mark_supplier_filter": "",
-                    "mark_company_filter": "",
-                    "mark_date_range": []
-                })
-                st.rerun()
-    
-            # Step 3: Filter Controls
-            with st.expander("🔍 Filter Options", expanded=True):
-                col1, col2 = st.columns(2)
-                supplier_filter = col1.text_input("🔍 Filter by Supplier", st.session_state.get("mark_supplier_filter", ""), key="mark_supplier_filter")
-                company_filter = col2.text_input("🏢 Filter by Company", st.session_state.get("mark_company_filter", ""), key="mark_company_filter")
-                date_range = st.date_input("📅 Filter by Invoice Date Range", st.session_state.get("mark_date_range", []), key="mark_date_range")
-    
-            # Step 4: Apply Filters
-            if supplier_filter:
-                df = df[df["supplier_name"].str.contains(supplier_filter, case=False, na=False)]
-            if company_filter:
-                df = df[df["company_name"].str.contains(company_filter, case=False, na=False)]
-            
-            # Filter by date range
-            df["invoice_date"] = pd.to_datetime(df["invoice_date"], errors="coerce")
-            
-            if len(date_range) == 2:
-                df = df[
-                    (df["invoice_date"] >= pd.to_datetime(date_range[0])) &
-                    (df["invoice_date"] <= pd.to_datetime(date_range[1]))
-                ]
-            
             # Format invoice_date as dd-mm-yyyy string
-            df["invoice_date"] = df["invoice_date"].apply(
-                lambda x: x.strftime("%d-%m-%Y") if pd.notnull(x) else ""
-            )
+            rows = [dict(row, invoice_date=display_date(row.get("invoice_date"))) for row in data]
     
-            
-            # Step 5: Select All + Table Setup
-            select_all = st.checkbox("🟢 Select All Filtered Rows", value=False, key="select_all_mark_paid")
-            df["select"] = select_all
-            df = df.drop(columns=["id", "status", "created_at", "paid_date", "paid_via", "remarks"], errors="ignore")
-            cols = ["select"] + [col for col in df.columns if col != "select"]
-            df = df[cols]
-    
-            # Step 6: Show Table
-            editable_cols = ["select"]
-            edited = st.data_editor(
-                df,
-                use_container_width=True,
-                num_rows="dynamic",
-                key="mark_paid_editor",
-                hide_index=True,
-                column_order=cols,
-                disabled=[col for col in df.columns if col not in editable_cols]
-            )
+            # Step 5: Select All (this page) + Table Setup
+            st.checkbox("🟢 Select All Rows on This Page", value=False, key="select_all_mark_paid",
+                        on_change=select_page, args=("mark_paid", rows))
+            cols = ["select"] + list(MARK_PAID_COLUMNS)
+    
+            # Step 6: Show this page only; selections on other pages are kept by invoice id
+            paged_editor(rows, "mark_paid", cols, ["select"], defaults={"select": False})
     
             # Step 7: Extract selected rows
-            selected = edited[edited["select"] == True]
+            selected_ids = log.ids_where("select", True)
+            if selected_ids:
+                st.caption(f"🟢 {len(selected_ids)} invoice(s) selected across pages")
     
             # Step 8: Payment Form
-            if not selected.empty:
+            if selected_ids:
                 paid_date = st.date_input("🗓️ Enter Paid Date", value=date.today())
                 paid_sources = [""] + get_dropdown_values("name", "paid_sources")
                 paid_via = st.selectbox("💳 Select Payment Source", paid_sources, index=0)
@@ -470,126 +544,117 @@ elif authentication_status:
                     st.warning("⚠️ Please select a valid paid date.")
     
                 if paid_via and paid_date and st.button("✅ Confirm Mark as Paid"):
-                    invoice_ids = selected["invoice_no"].tolist()
-                    update_invoice_paid_fields(invoice_ids, paid_date.isoformat(), paid_via, remark)
-                    st.success(f"✅ {len(invoice_ids)} invoice(s) marked as Paid.")
+                    labels = invoice_labels(log, selected_ids)
+                    result = update_invoice_paid_fields(selected_ids, paid_date.isoformat(), paid_via, remark)
+                    finish_bulk_update(log, selected_ids, result)
+                    st.success(f"✅ {len(result.updated)} invoice(s) marked as Paid.")
+                    show_bulk_result(result, labels)
     
     
     
     elif tab == "📁 Paid History":
         st.title("📁 Paid Invoice History")
     
-        data = get_invoices_by_status("Paid")
+        # Step 1: Initialize filter state
+        if "supplier_filter" not in st.session_state:
+            st.session_state["supplier_filter"] = ""
+        if "company_filter" not in st.session_state:
+            st.session_state["company_filter"] = ""
+        if "paid_via_filter" not in st.session_state:
+            st.session_state["paid_via_filter"] = ""
+        if "paid_history_date_range" not in st.session_state:
+            st.session_state["paid_history_date_range"] = []
+
+        # Step 2: Filters
+        if st.button("🧹 Clear All Filters"):
+            st.session_state.update({
+                "supplier_filter": "",
+                "company_filter": "",
+                "paid_via_filter": "",
+                "paid_history_date_range": []
+            })
+            st.rerun()
+
+        
+        with st.expander("🔍 Filter Options", expanded=True):
+            col1, col2 = st.columns(2)
+            supplier_filter = col1.text_input("🔍 Filter by Supplier", st.session_state.get("supplier_filter", ""), key="supplier_filter")
+            company_filter = col2.text_input("🏢 Filter by Company", st.session_state.get("company_filter", ""), key="company_filter")
+        
+            paid_via_filter = st.selectbox(
+                "💳 Filter by Payment Source",
+                options=[""] + get_dropdown_values("name", "paid_sources"),
+                index=0,
+                key="paid_via_filter"
+            )
+        
+            date_range = st.date_input(
+                "📅 Filter by Invoice Date Range",
+                st.session_state.get("paid_history_date_range", []),
+                key="paid_history_date_range"
+            )
+
+        # Step 3: Fetch the filtered page from Supabase
+        query = InvoiceQuery(
+            columns=PAID_HISTORY_COLUMNS,
+            status="Paid",
+            supplier=supplier_filter,
+            company=company_filter,
+            paid_via=paid_via_filter,
+            date_from=date_range[0] if len(date_range) == 2 else None,
+            date_to=date_range[1] if len(date_range) == 2 else None
+        )
+        data = fetch_invoice_page(query, "paid_history")
+        log = get_change_log("paid_history")
+
         if not data:
             st.info("No paid invoices found.")
         else:
-            df = pd.DataFrame(data)
-    
-            # Step 1: Initialize filter state
-            if "supplier_filter" not in st.session_state:
-                st.session_state["supplier_filter"] = ""
-            if "company_filter" not in st.session_state:
-                st.session_state["company_filter"] = ""
-            if "paid_via_filter" not in st.session_state:
-                st.session_state["paid_via_filter"] = ""
-            if "paid_history_date_range" not in st.session_state:
-                st.session_state["paid_history_date_range"] = []
-    
-            # Step 2: Filters
-            if st.button("🧹 Clear All Filters"):
-                st.session_state.update({
-                    "supplier_filter": "",
-                    "company_filter": "",
-                    "paid_via_filter": "",
-                    "paid_history_date_range": []
-                })
-                st.rerun()
-    
-            
-            with st.expander("🔍 Filter Options", expanded=True):
-                col1, col2 = st.columns(2)
-                supplier_filter = col1.text_input("🔍 Filter by Supplier", st.session_state.get("supplier_filter", ""), key="supplier_filter")
-                company_filter = col2.text_input("🏢 Filter by Company", st.session_state.get("company_filter", ""), key="company_filter")
-            
-                paid_via_filter = st.selectbox(
-                    "💳 Filter by Payment Source",
-                    options=[""] + get_dropdown_values("name", "paid_sources"),
-                    index=0,
-                    key="paid_via_filter"
-                )
-            
-                date_range = st.date_input(
-                    "📅 Filter by Invoice Date Range",
-                    st.session_state.get("paid_history_date_range", []),
-                    key="paid_history_date_range"
-                )
-            
-    
-            # Step 4: Apply filters
-            if supplier_filter:
-                df = df[df["supplier_name"].str.contains(supplier_filter, case=False, na=False)]
-            if company_filter:
-                df = df[df["company_name"].str.contains(company_filter, case=False, na=False)]
-            if paid_via_filter:
-                df = df[df["paid_via"].str.contains(paid_via_filter, case=False, na=False)]
-            # ✅ Step 1: Filter if date range is selected
-            # Filter by date range
-            df["invoice_date"] = pd.to_datetime(df["invoice_date"], errors="coerce")
-            
-            if len(date_range) == 2:
-                df = df[
-                    (df["invoice_date"] >= pd.to_datetime(date_range[0])) &
-                    (df["invoice_date"] <= pd.to_datetime(date_range[1]))
-                ]
-            
             # Format invoice_date as dd-mm-yyyy string
-            df["invoice_date"] = df["invoice_date"].apply(
-                lambda x: x.strftime("%d-%m-%Y") if pd.notnull(x) else ""
-            )
-    
-    
-            # Step 5: Select All
-            select_all = st.checkbox("🟢 Select All Filtered Rows", value=False, key="select_all_paid_history")
-            df["select"] = select_all
-    
-            # Step 6: Drop irrelevant columns
-            df = df.drop(columns=["id", "status", "created_at"], errors="ignore")
-    
-            # Step 7: Reorder columns
-            cols = ["select"] + [col for col in df.columns if col != "select"]
-            df = df[cols]
-    
-            # Step 8: Show data editor
-            editable_cols = ["select"]
-            edited = st.data_editor(
-                df,
-                use_container_width=True,
-                num_rows="dynamic",
-                key="paid_history_editor",
-                hide_index=True,
-                column_order=cols,
-                disabled=[col for col in df.columns if col not in editable_cols]
-            )
-    
-            # Step 9: Get selected rows
-            selected = edited[edited["select"] == True]
-    
-            # Step 10: Export all filtered rows
-            export_df = edited.drop(columns=["select"], errors="ignore")
-            excel = BytesIO()
-            export_df.to_excel(excel, index=False)
-            st.download_button(
-                label="📤 Download Filtered Invoices (Excel)",
-                data=excel.getvalue(),
-                file_name="paid_invoices.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            rows = [dict(row, invoice_date=display_date(row.get("invoice_date"))) for row in data]
+    
+            # Step 5: Select All (this page)
+            st.checkbox("🟢 Select All Rows on This Page", value=False, key="select_all_paid_history",
+                        on_change=select_page, args=("paid_history", rows))
+    
+            # Step 6: Columns shown (id stays the hidden row key)
+            cols = ["select"] + list(PAID_HISTORY_COLUMNS)
+    
+            # Step 7: Show this page only; selections on other pages are kept by invoice id
+            paged_editor(rows, "paid_history", cols, ["select"], defaults={"select": False})
+    
+            # Step 8: Get selected rows
+            selected_ids = log.ids_where("select", True)
+            if selected_ids:
+                st.caption(f"🟢 {len(selected_ids)} invoice(s) selected across pages")
+    
+            # Step 9: Export every filtered invoice (all pages), streamed page by page on request
+            export_key = (query, table_generation("invoices"))
+            if st.button("📤 Prepare Excel of All Filtered Invoices"):
+                try:
+                    export_rows = [dict(row, invoice_date=display_date(row.get("invoice_date")))
+                                   for page in read_pages(query) for row in page]
+                    excel = BytesIO()
+                    pd.DataFrame(export_rows, columns=list(PAID_HISTORY_COLUMNS)).to_excel(excel, index=False)
+                    st.session_state["paid_history_export"] = (export_key, excel.getvalue(), len(export_rows))
+                except requests.RequestException:
+                    st.error("❌ Could not load all filtered invoices for export. Please try again.")
+            export = st.session_state.get("paid_history_export")
+            if export and export[0] == export_key:
+                st.download_button(
+                    label=f"📤 Download {export[2]} Filtered Invoices (Excel)",
+                    data=export[1],
+                    file_name="paid_invoices.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
     
-            # Step 11: Mark as Unpaid
-            if not selected.empty and st.button("↩️ Mark Selected as Unpaid"):
-                invoice_ids = selected["invoice_no"].tolist()
-                update_invoice_paid_fields(invoice_ids, None, None, None, status="Unpaid")
-                st.success(f"🔁 {len(invoice_ids)} invoices marked as Unpaid. Please refresh the page.")
+            # Step 10: Mark as Unpaid
+            if selected_ids and st.button("↩️ Mark Selected as Unpaid"):
+                labels = invoice_labels(log, selected_ids)
+                result = update_invoice_paid_fields(selected_ids, None, None, None, status="Unpaid")
+                finish_bulk_update(log, selected_ids, result)
+                st.success(f"🔁 {len(result.updated)} invoices marked as Unpaid. Please refresh the page.")
+                show_bulk_result(result, labels)
 
 
     if tab == "⚙️ Manage Master Tables":
@@ -597,9 +662,11 @@ elif authentication_status:
         table_type = st.radio("Select Table to Manage", ["supplier_names", "paid_sources"])
 
         def fetch_table(table):
-            url = f"{SUPABASE_URL}/rest/v1/{table}?select=*"
-            res = requests.get(url, headers=supabase_headers())
-            return pd.DataFrame(res.json()) if res.status_code == 200 else pd.DataFrame()
+            try:
+                return pd.DataFrame(select_rows(table))
+            except requests.RequestException as e:
+                st.error(f"❌ Could not load {table} from Supabase: {e}")
+                return pd.DataFrame()
 
         df = fetch_table(table_type)
 
@@ -623,16 +690,17 @@ elif authentication_status:
                     payload["has_invoice_extractor"] = has_invoice_extractor
                     payload["has_soa_extractor"] = has_soa_extractor
 
-                response = requests.post(
-                    f"{SUPABASE_URL}/rest/v1/{table_type}",
-                    json=payload,
-                    headers={**supabase_headers(), "Prefer": "return=representation"}
-                )
-                if response.status_code in [200, 201]:
-                    st.success(f"✅ Added '{new_name}' to {table_type}")
-                    st.rerun()
+                try:
+                    response = supabase.post(table_type, json=payload, prefer="return=representation")
+                except requests.RequestException as e:
+                    st.error(f"❌ Failed to add. Supabase is unavailable: {e}")
                 else:
-                    st.error(f"❌ Failed to add. Status: {response.status_code}")
+                    invalidate(table_type)
+                    if response.status_code in [200, 201]:
+                        st.success(f"✅ Added '{new_name}' to {table_type}")
+                        st.rerun()
+                    else:
+                        st.error(f"❌ Failed to add. Status: {response.status_code}")
             else:
                 st.warning("Please enter a name.")
 
@@ -645,17 +713,26 @@ elif authentication_status:
             to_delete = edited[edited["🗑️ Delete"] == True]
 
             if not to_delete.empty and st.button("🗑️ Confirm Delete Selected"):
+                failed = []
                 for _, row in to_delete.iterrows():
                     delete_name = row["name"]
-                    delete_url = f"{SUPABASE_URL}/rest/v1/{table_type}?name=eq.{delete_name}"
-                    res = requests.delete(delete_url, headers=supabase_headers())
-                st.success(f"🗑️ Deleted {len(to_delete)} entries.")
-                st.rerun()
+                    try:
+                        supabase.delete(f"{table_type}?name=eq.{delete_name}").raise_for_status()
+                    except requests.RequestException:
+                        failed.append(delete_name)
+                invalidate(table_type)
+                if failed:
+                    st.error(f"❌ Failed to delete: {', '.join(failed)}")
+                else:
+                    st.success(f"🗑️ Deleted {len(to_delete)} entries.")
+                    st.rerun()
         else:
             st.info("No records found.")
 
 
     elif tab == "📝 Manual Invoice Entry":
+        from dedup import invoice_exists
+        from invoice_bloom import get_key_filter
         st.title("📝 Manual Invoice Entry")
     
         # Fetch dropdown options
@@ -693,17 +770,15 @@ elif authentication_status:
                 invoice_date_str = invoice_date.strftime("%Y-%m-%d")
                 due_date_str = due_date.strftime("%Y-%m-%d") if due_date else None
     
-                # Check for duplicates
-                check_url = (
-                    f"{SUPABASE_URL}/rest/v1/invoices"
-                    f"?select=invoice_no,invoice_date"
-                    f"&invoice_no=eq.{invoice_no}&invoice_date=eq.{invoice_date_str}"
-                )
-                check_res = requests.get(check_url, headers=supabase_headers())
-    
-                if check_res.status_code == 200 and check_res.json():
+                # Check for duplicates (no request when the Bloom filter rules it out)
+                try:
+                    exists = invoice_exists(supabase, supplier_name, invoice_no, invoice_date_str)
+                except requests.RequestException as e:
+                    exists = None
+                    st.error(f"❌ Could not check for duplicates, invoice not saved: {e}")
+                if exists:
                     st.error("❌ This invoice already exists.")
-                else:
+                elif exists is False:
                     payload = {
                         "supplier_name": supplier_name,
                         "company_name": company_name,
@@ -716,15 +791,17 @@ elif authentication_status:
                         "status": "Unpaid"
                     }
     
-                    res = requests.post(
-                        f"{SUPABASE_URL}/rest/v1/invoices",
-                        json=payload,
-                        headers={**supabase_headers(), "Prefer": "return=representation"}
-                    )
-    
-                    if res.status_code in [200, 201]:
-                        st.success(f"✅ Invoice {invoice_no} saved successfully.")
-                        # st.rerun()  # 🔁 Clears the form completely
+                    try:
+                        res = supabase.post("invoices", json=payload, prefer="return=representation")
+                    except requests.RequestException as e:
+                        st.error(f"❌ Failed to save invoice. Supabase is unavailable: {e}")
                     else:
-                        st.error(f"❌ Failed to save invoice. Status: {res.status_code}")
-                        st.json(res.json())
+                        invoices_changed()
+    
+                        if res.status_code in [200, 201]:
+                            get_key_filter().add_rows([payload])
+                            st.success(f"✅ Invoice {invoice_no} saved successfully.")
+                            # st.rerun()  # 🔁 Clears the form completely
+                        else:
+                            st.error(f"❌ Failed to save invoice. Status: {res.status_code}")
+                            st.json(res.json())
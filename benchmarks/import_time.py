@@ -0,0 +1,72 @@
+# Cold-start benchmark: what each tab imports, measured with `python -X importtime`
+# in a fresh interpreter per tab (nothing is shared through sys.modules).
+# "startup" is what every authenticated rerun imports before any tab renders;
+# each tab row adds that tab's own imports on top of it.
+#
+# Usage: python benchmarks/import_time.py [repeats] [top]
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP = [
+    "streamlit", "streamlit_authenticator", "yaml", "requests", "pandas",
+    "extractor_registry", "supabase_client", "bulk_ops", "invoice_query", "invoice_mirror",
+    "data_cache", "paged_editor",
+]
+TAB_IMPORTS = {
+    "startup": [],
+    "upload (processing)": ["ingestion", "supplier_detection", "dedup", "pdf_document", "extraction_cache"],
+    "upload (extractor run)": ["supplier_extractors"],
+    "upload (AI fallback)": ["ai_extractor"],
+    "manual entry": ["dedup", "invoice_bloom"],
+    "dashboard": ["dashboard"],
+    # Everything app.py imported up front before imports were made per tab
+    "eager (all)": ["supplier_extractors", "supplier_detection", "pdf_document", "extraction_cache",
+                    "ingestion", "dashboard", "ai_extractor", "dedup", "invoice_bloom"],
+}
+
+
+# A module that fails to import (missing dependency, secrets) is reported, not fatal.
+# A plain import statement: importlib.import_module() isn't logged by -X importtime.
+CHILD = """
+import sys
+for module in sys.argv[1:]:
+    try:
+        exec(f"import {module}")
+    except Exception as e:
+        print(f"{module}: {type(e).__name__}: {e}")
+"""
+
+
+def import_times(modules):
+    # Returns ({module: cumulative us} for imports, [errors]); top-level names have no indent
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD, *modules],
+                          cwd=ROOT, capture_output=True, text=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name[1:].rstrip()] = int(cumulative)
+    return times, proc.stdout.splitlines()
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{'tab':<24} {'import ms':>10}   heaviest top-level imports (ms)")
+    for tab, modules in TAB_IMPORTS.items():
+        runs = [import_times(STARTUP + modules) for _ in range(repeats)]
+        times, errors = min(runs, key=lambda run: sum(t for name, t in run[0].items() if not name.startswith(" ")))
+        top_level = {name: t for name, t in times.items() if not name.startswith(" ")}
+        heaviest = sorted(top_level.items(), key=lambda item: -item[1])[:top]
+        print(f"{tab:<24} {sum(top_level.values()) / 1000:>10.1f}   "
+              + ", ".join(f"{name} {t / 1000:.0f}" for name, t in heaviest))
+        for error in errors:
+            print(f"{'':<24} {'':>10}   ⚠️ {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import json
+import requests
+from urllib.parse import quote
+
+# ---------------------- Bulk Operations ----------------------
+# Many-row writes sent as a few PostgREST requests using `in.(...)` filters
+# instead of one round trip per invoice. Each chunk is a single statement on
+# the server, so it either applies to all of its rows or to none of them.
+
+# Kept well below the ~8 KB request-line limit of common proxies
+MAX_URL_LENGTH = 6000
+
+
+def in_filter_value(value):
+    # Double-quoted so commas, dots and parentheses in invoice numbers survive
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return quote(f'"{text}"', safe="")
+
+
+def chunk_in_filter(values, prefix_length, max_length=MAX_URL_LENGTH):
+    # Yields (values, "v1,v2,...") with each full URL under max_length
+    chunk, encoded, length = [], [], prefix_length
+    for value in values:
+        item = in_filter_value(value)
+        if chunk and length + len(item) + 1 > max_length:
+            yield chunk, ",".join(encoded)
+            chunk, encoded, length = [], [], prefix_length
+        chunk.append(value)
+        encoded.append(item)
+        length += len(item) + 1
+    if chunk:
+        yield chunk, ",".join(encoded)
+
+
+class BulkResult:
+    def __init__(self):
+        self.updated = []   # keys the server confirmed
+        self.missing = []   # keys that matched no row
+        self.failed = {}    # key -> error of the chunk it was sent in
+
+    @property
+    def ok(self):
+        return not self.missing and not self.failed
+
+
+def _send(send, *args, **kwargs):
+    # Returns (response, None) or (None, error message)
+    try:
+        res = send(*args, **kwargs)
+    except requests.RequestException as e:
+        return None, str(e)
+    if not res.ok:
+        return None, f"HTTP {res.status_code}: {res.text[:200]}"
+    return res, None
+
+
+def _in_filter_paths(client, base, keys):
+    # Yields (chunk_keys, path) for `base` ending in "=in."
+    prefix_length = len(client.base_url) + len(base) + 3
+    for chunk, in_list in chunk_in_filter(keys, prefix_length):
+        yield chunk, f"{base}({in_list})"
+
+
+def bulk_update(client, table, column, keys, payload):
+    # PATCH every row whose `column` is in `keys`; results are reported per key
+    result = BulkResult()
+    keys = list(dict.fromkeys(str(key) for key in keys))
+
+    for chunk, path in _in_filter_paths(client, f"{table}?select={column}&{column}=in.", keys):
+        # Same payload for every row, so a retried PATCH is harmless
+        res, error = _send(client.patch, path, json=payload, prefer="return=representation", idempotent=True)
+        if error:
+            result.failed.update((key, error) for key in chunk)
+            continue
+        returned = {str(row[column]) for row in res.json()}
+        for key in chunk:
+            (result.updated if key in returned else result.missing).append(key)
+    return result
+
+
+def set_invoice_status(client, invoice_ids, status, paid_date=None, paid_via=None, remark=None):
+    # Keyed on id: invoice numbers are only unique per supplier and company
+    payload = {
+        "status": status,
+        "paid_date": paid_date,
+        "paid_via": paid_via,
+        "remarks": remark
+    }
+    return bulk_update(client, "invoices", "id", invoice_ids, payload)
+
+
+# ---------------------- Change Sets ----------------------
+# Edits from a data editor, applied with optimistic concurrency: rows that
+# were changed or removed on the server since they were loaded are reported
+# as conflicted and left alone. Updates go out as one upsert on the primary
+# key and deletions as one `in.(...)` delete (per chunk).
+
+UPSERT_CHUNK_ROWS = 500
+
+
+class ChangeSet:
+    def __init__(self):
+        self.updates = {}   # key -> {column: new value}
+        self.deletes = []
+
+    def update(self, key, changes):
+        self.updates.setdefault(str(key), {}).update(changes)
+
+    def delete(self, key):
+        self.updates.pop(str(key), None)
+        self.deletes.append(str(key))
+
+    def __bool__(self):
+        return bool(self.updates or self.deletes)
+
+
+class ChangeSetResult:
+    def __init__(self):
+        self.applied = []
+        self.failed = {}      # key -> error
+        self.conflicted = []  # changed or deleted by someone else since loading
+
+
+def _json_value(value):
+    # numpy scalars and NaN from DataFrames aren't valid JSON
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _fetch_rows(client, table, key, keys):
+    rows = {}
+    for chunk, path in _in_filter_paths(client, f"{table}?select=*&{key}=in.", keys):
+        res, error = _send(client.get, path)
+        if error:
+            raise requests.RequestException(error)
+        rows.update((str(row[key]), row) for row in res.json())
+    return rows
+
+
+def apply_change_set(client, table, change_set, original_rows, key="id"):
+    # original_rows: the records the editor was built from
+    result = ChangeSetResult()
+    originals = {str(row[key]): row for row in original_rows}
+    keys = list(change_set.updates) + change_set.deletes
+    if not keys:
+        return result
+
+    try:
+        current = _fetch_rows(client, table, key, keys)
+    except requests.RequestException as e:
+        result.failed.update((k, str(e)) for k in keys)
+        return result
+
+    fresh = []
+    for k in keys:
+        # Only the columns the editor loaded are compared
+        original = originals.get(k, {})
+        if k not in current or any(current[k].get(column) != value for column, value in original.items()):
+            result.conflicted.append(k)
+        else:
+            fresh.append(k)
+    fresh_set = set(fresh)
+
+    # Full rows, so every upserted row has the same columns and satisfies NOT NULL
+    upserts = [
+        {column: _json_value(value) for column, value in {**current[k], **changes}.items()}
+        for k, changes in change_set.updates.items() if k in fresh_set
+    ]
+    for start in range(0, len(upserts), UPSERT_CHUNK_ROWS):
+        chunk = upserts[start:start + UPSERT_CHUNK_ROWS]
+        res, error = _send(client.post, f"{table}?on_conflict={key}", json=chunk,
+                           prefer="resolution=merge-duplicates,return=representation", idempotent=True)
+        if error:
+            result.failed.update((str(row[key]), error) for row in chunk)
+        else:
+            result.applied.extend(str(row[key]) for row in res.json())
+
+    deletes = [k for k in change_set.deletes if k in fresh_set]
+    for chunk, path in _in_filter_paths(client, f"{table}?select={key}&{key}=in.", deletes):
+        res, error = _send(client.delete, path, prefer="return=representation")
+        if error:
+            result.failed.update((k, error) for k in chunk)
+            continue
+        deleted = {str(row[key]) for row in res.json()}
+        for k in chunk:
+            # Gone between the check and the delete
+            (result.applied if k in deleted else result.conflicted).append(k)
+
+    return result
+
+
+# ---------------------- Bulk Insert ----------------------
+# Rows are posted in chunks sized by JSON payload bytes, as upserts that
+# ignore rows whose invoice key already exists (unique index from
+# sql/invoice_unique_key.sql). Re-sending a chunk that failed or timed out
+# is therefore safe: rows that did land are skipped, not duplicated.
+# Until that index exists PostgREST rejects on_conflict, and chunks fall
+# back to plain inserts (sent once, not retried).
+
+MAX_PAYLOAD_BYTES = 256 * 1024
+INVOICE_KEY = "supplier_name,invoice_no,invoice_date"
+
+
+def chunk_by_bytes(rows, max_bytes=MAX_PAYLOAD_BYTES):
+    chunk, size = [], 2  # the enclosing []
+    for row in rows:
+        row_size = len(json.dumps(row, default=str)) + 2  # ", " separator
+        if chunk and size + row_size > max_bytes:
+            yield chunk
+            chunk, size = [], 2
+        chunk.append(row)
+        size += row_size
+    if chunk:
+        yield chunk
+
+
+class ChunkResult:
+    def __init__(self, rows, inserted=0, error=None):
+        self.rows = rows
+        self.inserted = inserted  # rows actually written; the rest already existed
+        self.error = error
+
+    @property
+    def skipped(self):
+        return 0 if self.error else len(self.rows) - self.inserted
+
+
+def _no_unique_key(res):
+    # 42P10: no unique index matches on_conflict (sql/invoice_unique_key.sql not applied)
+    try:
+        return res.status_code == 400 and res.json().get("code") == "42P10"
+    except ValueError:
+        return False
+
+
+def _upsert_chunk(client, table, chunk, on_conflict):
+    # Returns (response, None), (None, error), or (None, None) when on_conflict has no unique index
+    try:
+        res = client.post(f"{table}?on_conflict={on_conflict}", json=chunk,
+                          prefer="resolution=ignore-duplicates,return=representation", idempotent=True)
+    except requests.RequestException as e:
+        return None, str(e)
+    if _no_unique_key(res):
+        return None, None
+    if not res.ok:
+        return None, f"HTTP {res.status_code}: {res.text[:200]}"
+    return res, None
+
+
+def bulk_insert(client, table, rows, on_conflict=INVOICE_KEY, max_bytes=MAX_PAYLOAD_BYTES):
+    results = []
+    upsert = bool(on_conflict)
+    for chunk in chunk_by_bytes(rows, max_bytes):
+        res, error = _upsert_chunk(client, table, chunk, on_conflict) if upsert else (None, None)
+        if res is None and error is None:
+            # No unique key to skip existing rows on: plain inserts for this and later chunks
+            upsert = False
+            res, error = _send(client.post, table, json=chunk, prefer="return=representation")
+        results.append(ChunkResult(chunk, len(res.json()) if res is not None else 0, error))
+    return results
@@ -1,68 +1,120 @@
 # dashboard.py
 import streamlit as st
 import pandas as pd
-from datetime import datetime
 import requests
-import os
+from datetime import datetime
+from invoice_query import InvoiceQuery
+from aging import AgingInputs, aging_report, month_ends
+from data_cache import INVOICE_TTL, table_generation
+from invoice_mirror import get_mirror, read_pages
+from rollups import CLOSED_UNKNOWN
+
+DASHBOARD_COLUMNS = ("supplier_name", "company_name", "invoice_date", "due_date", "paid_date", "amount", "status")
+DASHBOARD_PAGE_SIZE = 1000  # Supabase's default max-rows
+
+ROLLUP_COLUMNS = ["month", "status", "supplier_name", "company_name", "invoice_count", "amount"]
+BASIS_COLUMNS = ["supplier_name", "invoice_date", "due_date", "closed_date", "invoice_count", "amount"]
+AGING_SNAPSHOTS = 12  # month-ends shown next to today's aging
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_API_KEY = os.getenv("SUPABASE_API_KEY")
+# Fetch all invoices, page by page (from the local mirror when it's in sync)
+def iter_invoice_frames():
+    query = InvoiceQuery(columns=DASHBOARD_COLUMNS)
+    for rows in read_pages(query, DASHBOARD_PAGE_SIZE):
+        page = pd.DataFrame(rows, columns=DASHBOARD_COLUMNS)
+        # Typed per page, so only compact columns are held while streaming
+        page["invoice_date"] = pd.to_datetime(page["invoice_date"], errors="coerce")
+        page["due_date"] = pd.to_datetime(page["due_date"], errors="coerce")
+        page["paid_date"] = pd.to_datetime(page["paid_date"], errors="coerce")
+        page["amount"] = pd.to_numeric(page["amount"], errors="coerce")
+        page["status"] = page["status"].astype("category")
+        page["supplier_name"] = page["supplier_name"].astype("category")
+        page["company_name"] = page["company_name"].astype("category")
+        yield page
 
-# Fetch all invoices
-def fetch_all_invoices():
-    url = f"{SUPABASE_URL}/rest/v1/invoices?select=*&limit=10000"
-    
-    headers = {
-        "apikey": SUPABASE_API_KEY,
-        "Authorization": f"Bearer {SUPABASE_API_KEY}",
-    }
+# Same aggregates as rollups.py, computed from raw rows when the mirror is unavailable
+def aggregate_frames(frames):
+    # Categories differ per page, so concat yields plain object columns again
+    df = pd.concat(frames, ignore_index=True)
+    status = df["status"].astype(object).fillna("")
+    paid_date = df["paid_date"].dt.strftime("%Y-%m-%d").fillna(CLOSED_UNKNOWN)
+    keys = pd.DataFrame({
+        "month": df["invoice_date"].dt.strftime("%Y-%m").fillna(""),
+        "invoice_date": df["invoice_date"].dt.strftime("%Y-%m-%d").fillna(""),
+        "due_date": df["due_date"].dt.strftime("%Y-%m-%d").fillna(""),
+        "closed_date": paid_date.where(status == "Paid", ""),
+        "status": status,
+        "supplier_name": df["supplier_name"].astype(object).fillna(""),
+        "company_name": df["company_name"].astype(object).fillna(""),
+        "amount": df["amount"].fillna(0)
+    })
+    rollup = keys.groupby(ROLLUP_COLUMNS[:4]).agg(
+        invoice_count=("amount", "size"), amount=("amount", "sum")
+    ).reset_index()
+    basis = keys[keys["status"].isin(["Paid", "Unpaid"])].groupby(BASIS_COLUMNS[:4]).agg(
+        invoice_count=("amount", "size"), amount=("amount", "sum")
+    ).reset_index()
+    return rollup, basis
 
-    res = requests.get(url, headers=headers)
-    if res.status_code == 200:
-        return res.json()
-    return []
+def load_aggregates():
+    # Returns (rollup, aging basis, data version) or None when there are no invoices.
+    # The version is None when the aggregates were computed from Supabase rows.
+    mirror = get_mirror()
+    if mirror.sync():
+        rollup_rows, basis_rows, generation = mirror.read_rollups()
+        if not rollup_rows:
+            return None
+        return (pd.DataFrame(rollup_rows, columns=ROLLUP_COLUMNS),
+                pd.DataFrame(basis_rows, columns=BASIS_COLUMNS), f"{mirror.path}:{generation}")
+    frames = list(iter_invoice_frames())
+    return (*aggregate_frames(frames), None) if frames else None
+
+@st.cache_data(ttl=INVOICE_TTL, max_entries=4, show_spinner=False)
+def cached_aggregates(generation):
+    # Re-read after our own invoice writes (generation) or once the TTL passes
+    return load_aggregates()
 
 # Dashboard Tab
 def render_dashboard():
     st.title("📊 Invoice Tracker Dashboard")
 
-    invoices = fetch_all_invoices()
-    if not invoices:
+    try:
+        aggregates = cached_aggregates(table_generation("invoices"))
+    except requests.RequestException as e:
+        st.error(f"❌ Failed to load invoices: {e}")
+        return
+    if aggregates is None:
         st.warning("No invoice data found.")
         return
-
-    df = pd.DataFrame(invoices)
-
-    # Clean and convert
-    df["invoice_date"] = pd.to_datetime(df["invoice_date"], errors="coerce")
-    df["due_date"] = pd.to_datetime(df["due_date"], errors="coerce")
+    rollup, basis, data_version = aggregates
 
     # KPI Metrics
-    total = len(df)
-    paid = df[df["status"] == "Paid"]
-    unpaid = df[df["status"] == "Unpaid"]
+    total = rollup["invoice_count"].sum()
+    paid = rollup[rollup["status"] == "Paid"]
+    unpaid = rollup[rollup["status"] == "Unpaid"]
 
     col1, col2, col3 = st.columns(3)
-    col1.metric("📦 Total Invoices", total)
-    col2.metric("✅ Paid", len(paid), f"${paid['amount'].sum():,.2f}")
-    col3.metric("⏳ Outstanding", len(unpaid), f"${unpaid['amount'].sum():,.2f}")
+    col1.metric("📦 Total Invoices", int(total))
+    col2.metric("✅ Paid", int(paid["invoice_count"].sum()), f"${paid['amount'].sum():,.2f}")
+    col3.metric("⏳ Outstanding", int(unpaid["invoice_count"].sum()), f"${unpaid['amount'].sum():,.2f}")
 
     # Monthly Trend
-    df["month"] = df["invoice_date"].dt.to_period("M").astype(str)
-    trend = df.groupby(["month", "status"])["amount"].sum().unstack(fill_value=0).reset_index()
+    dated = rollup[rollup["month"] != ""]
+    trend = dated.groupby(["month", "status"])["amount"].sum().unstack(fill_value=0).reset_index()
     st.subheader("📈 Monthly Invoice Trend")
     st.line_chart(trend.set_index("month"))
 
     # Supplier Outstanding
-    out_by_supplier = unpaid.groupby("supplier_name")["amount"].sum().sort_values()
+    named = unpaid[unpaid["supplier_name"] != ""]
+    out_by_supplier = named.groupby("supplier_name")["amount"].sum().sort_values()
     st.subheader("🏢 Outstanding Amount by Supplier")
     st.bar_chart(out_by_supplier)
 
-    # Aging Report
-    today = pd.Timestamp.today()
-    unpaid["age"] = (today - unpaid["due_date"]).dt.days
-    unpaid["bucket"] = pd.cut(unpaid["age"], bins=[-9999, 0, 30, 60, 90, 99999],
-                                labels=["Not Due", "0–30", "31–60", "61–90", "90+"])
-    aging = unpaid.groupby("bucket")["amount"].sum().reindex(["Not Due", "0–30", "31–60", "61–90", "90+"]).fillna(0)
+    # Aging Report: today and the last month-ends in one pass
+    today = pd.Timestamp.today().normalize()
+    aging = aging_report(AgingInputs.from_frame(basis), [*month_ends(AGING_SNAPSHOTS, today), today], data_version)
     st.subheader("📊 Aging Summary (Outstanding)")
-    st.bar_chart(aging)
+    st.bar_chart(aging.iloc[-1])
+    with st.expander("🗓️ Month-end Aging Snapshots"):
+        snapshots = aging.iloc[:-1].set_axis(aging.index[:-1].strftime("%Y-%m-%d"))
+        st.bar_chart(snapshots)
+        st.dataframe(snapshots.style.format("${:,.2f}"))
@@ -0,0 +1,67 @@
+import os
+import threading
+import streamlit as st
+from invoice_mirror import read_page
+from invoice_query import PAGE_SIZE
+from supabase_client import get_supabase
+
+# ---------------------- Data Cache ----------------------
+# st.cache_data over Supabase reads, keyed per table and query. Every key
+# includes its table's generation; a write bumps that generation, so exactly
+# that table's entries miss on the next read while other tables stay cached
+# (superseded entries age out by TTL / max_entries). TTLs bound how stale a
+# read can be after writes made outside this server process.
+
+MASTER_TTL = int(os.getenv("MASTER_CACHE_TTL", "600"))  # supplier/company/paid source lists
+INVOICE_TTL = int(os.getenv("INVOICE_CACHE_TTL", "30"))
+
+
+class TableGenerations:
+    def __init__(self):
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, table):
+        return self._generations.get(table, 0)
+
+    def bump(self, table):
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+
+
+@st.cache_resource
+def get_generations():
+    # Shared by every session, so one user's write invalidates everyone's cache
+    return TableGenerations()
+
+
+def table_generation(table):
+    return get_generations().get(table)
+
+
+def invalidate(*tables):
+    generations = get_generations()
+    for table in tables:
+        generations.bump(table)
+
+
+@st.cache_data(ttl=MASTER_TTL, max_entries=64, show_spinner=False)
+def _select_rows(table, select, generation):
+    # Errors raise, and raised calls are never cached
+    res = get_supabase().get(table, params=[("select", select)])
+    res.raise_for_status()
+    return res.json()
+
+
+def select_rows(table, select="*"):
+    return _select_rows(table, select, table_generation(table))
+
+
+@st.cache_data(ttl=INVOICE_TTL, max_entries=256, show_spinner=False)
+def _invoice_page(query, after, page_size, generation):
+    return read_page(query, after, page_size)
+
+
+def cached_invoice_page(query, after=None, page_size=PAGE_SIZE):
+    # Same contract as invoice_mirror.read_page
+    return _invoice_page(query, after, page_size, table_generation("invoices"))
@@ -0,0 +1,66 @@
+import pandas as pd
+from bulk_ops import chunk_in_filter
+from invoice_bloom import get_key_filter
+
+# ---------------------- Duplicate Check ----------------------
+# An invoice is identified by (supplier_name, invoice_no, invoice_date). Keys
+# the local Bloom filter has never seen are new without a network call; only
+# the remaining invoice numbers are looked up (chunked in.() filters), so the
+# cost grows with the batch, not with the invoice history.
+
+KEY_COLUMNS = ["supplier_name", "invoice_no", "invoice_date"]
+
+
+def existing_invoice_keys(client, invoice_nos):
+    # Returns {(supplier_name, invoice_no, invoice_date)} already stored for these numbers
+    invoice_nos = list(dict.fromkeys(str(no) for no in invoice_nos))
+    base = "invoices?select=supplier_name,invoice_no,invoice_date&invoice_no=in."
+    keys = set()
+    for _, in_list in chunk_in_filter(invoice_nos, len(client.base_url) + len(base) + 3):
+        res = client.get(f"{base}({in_list})")
+        res.raise_for_status()
+        keys.update(
+            (row["supplier_name"], row["invoice_no"], row["invoice_date"])
+            for row in res.json() if row.get("invoice_no") and row.get("invoice_date")
+        )
+    return keys
+
+
+def duplicate_mask(df, existing_keys):
+    # Vectorized set membership of each row's key
+    if not existing_keys:
+        return pd.Series(False, index=df.index)
+    keys = pd.MultiIndex.from_arrays([df["supplier_name"], df["invoice_no"].astype(str), df["invoice_date"]])
+    return pd.Series(keys.isin(list(existing_keys)), index=df.index)
+
+
+def find_duplicates(client, df):
+    # df needs KEY_COLUMNS with invoice_date as YYYY-MM-DD
+    key_filter = get_key_filter()
+    key_filter.refresh()
+    possible = pd.Series(
+        [key_filter.might_contain(*key) for key in df[KEY_COLUMNS].itertuples(index=False, name=None)],
+        index=df.index, dtype=bool
+    )
+    if not possible.any():
+        return possible
+    existing_keys = existing_invoice_keys(client, df.loc[possible, "invoice_no"])
+    return duplicate_mask(df, existing_keys) & possible
+
+
+def invoice_exists(client, supplier_name, invoice_no, invoice_date):
+    key_filter = get_key_filter()
+    key_filter.refresh()
+    if not key_filter.might_contain(supplier_name, invoice_no, invoice_date):
+        return False
+    res = client.get(
+        "invoices", params=[
+            ("select", "invoice_no"),
+            ("supplier_name", f"eq.{supplier_name}"),
+            ("invoice_no", f"eq.{invoice_no}"),
+            ("invoice_date", f"eq.{invoice_date}")
+        ]
+    )
+    # A failed check raises: an error must not read as "not a duplicate"
+    res.raise_for_status()
+    return bool(res.json())
@@ -0,0 +1,31 @@
+import os
+from disk_cache import DiskCache, content_hash
+from pdf_document import ParsedDocument
+from extractor_registry import EXTRACTOR_VERSION
+
+# ---------------------- Extraction Cache ----------------------
+# Extracted rows keyed on the PDF bytes and the extractor that produced them,
+# so Streamlit reruns (checkbox toggles, grid edits) never re-parse a PDF.
+
+EXTRACTION_CACHE = DiskCache(
+    "extractions",
+    max_bytes=int(os.getenv("EXTRACTION_CACHE_MB", "256")) * 1024 * 1024
+)
+
+
+def extractor_id(extractor):
+    return f"{extractor.__module__}.{extractor.__qualname__}@v{EXTRACTOR_VERSION}"
+
+
+def extraction_key(data, extractor, supplier_name, company_name):
+    # Rows embed supplier/company names, so they are part of the key too
+    return "|".join([content_hash(data), extractor_id(extractor), supplier_name, company_name])
+
+
+def cached_extract(data, extractor, supplier_name, company_name):
+    key = extraction_key(data, extractor, supplier_name, company_name)
+    rows = EXTRACTION_CACHE.get(key)
+    if rows is None:
+        rows = extractor(ParsedDocument.from_pdf(data), supplier_name, company_name)
+        EXTRACTION_CACHE.set(key, rows)
+    return rows
@@ -0,0 +1,57 @@
+from collections.abc import Mapping
+from importlib import import_module
+
+# ---------------------- Extractor Registry ----------------------
+# Which extractor handles which (supplier_name, is_soa), by name only. Listing
+# suppliers or checking for an extractor doesn't import supplier_extractors
+# (and its OCR/PDF dependencies); the module is imported the first time an
+# extractor is actually looked up.
+
+# Bump whenever an extractor's output changes so cached extractions are ignored
+EXTRACTOR_VERSION = 4
+
+EXTRACTOR_NAMES = {
+    ("Sourdough Factory", False): "extract_sourdough_invoice",
+    ("Fuluxe", False): "extract_fu_luxe_invoice",
+    ("Air Liquide Singapore", False): "extract_air_liquide_invoice",
+    ("Classic Fine Foods", True): "extract_classic_fine_foods_soa",
+    ("Mr Popiah", True): "extract_mr_popiah_soa",
+    ("Double Chin Food", True): "extract_double_chin_soa",
+    ("Gourmet Perfect", True): "extract_gourmet_perfect_soa",
+    ("Over Foods", False): "extract_over_foods_invoice",
+    ("Gan Teck Kar Investments", False): "extract_gan_teck_invoice",
+    ("1800 NO PESTS", False): "extract_nopests_invoice",
+    ("1800 NO PESTS", True): "extract_nopests_soa",
+    ("Dutch Colony", False): "extract_dutch_colony_invoice",
+    ("Equipmax", True): "extract_equipmax_soa",
+    ("Recipedia Group", True): "extract_recipedia_soa",
+    ("Ardwolf Pestkare", False): "extract_aardwolf_invoice",
+    ("Genie Pro", False): "extract_genie_pro_invoice",
+    ("Food Xervices", True): "extract_foodxervices_inc_soa",
+    ("Electric Tipo Novena - RR60063", False): "extract_tipo_novena_electric_invoice",
+    ("Dawood Exports", True): "extract_dawood_exports_soa",
+    ("Fuluxe", True): "extract_fu_luxe_soa",
+    ("Bidfood", True): "extract_bidfood_soa",
+
+
+    # Add more (supplier_name, is_soa): "name of the extractor in supplier_extractors"
+    # (single invoices can be data-only: TemplateExtractor(InvoiceTemplate(...)))
+}
+
+
+class LazyExtractors(Mapping):
+    def __getitem__(self, key):
+        name = EXTRACTOR_NAMES[key]
+        return getattr(import_module("supplier_extractors"), name)
+
+    def __contains__(self, key):
+        return key in EXTRACTOR_NAMES
+
+    def __iter__(self):
+        return iter(EXTRACTOR_NAMES)
+
+    def __len__(self):
+        return len(EXTRACTOR_NAMES)
+
+
+SUPPLIER_EXTRACTORS = LazyExtractors()
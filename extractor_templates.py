@@ -0,0 +1,149 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+# ---------------------- Extractor Templates ----------------------
+# Single-invoice extractors described as data. A template is compiled once
+# into a TemplateExtractor, which fills every field in a single pass over the
+# document's lines instead of one loop (or full-text search) per field.
+
+
+@dataclass(frozen=True)
+class FieldRule:
+    pattern: str = None         # searched in each line; capture groups are joined with spaces
+    anchor: str = None          # only lines containing this text are tried
+    next_line: str = None       # searched in the following line when the anchor line has no match
+    date_formats: tuple = ()    # parse the value into dd/mm/yyyy
+    keep_unparsed: bool = False  # keep the raw value when no date format matches
+    last: bool = False          # keep the last match in the document instead of the first
+    ignore_case: bool = False
+    strip_commas: bool = False
+
+
+@dataclass(frozen=True)
+class InvoiceTemplate:
+    name: str
+    # field name -> FieldRule, or a tuple of FieldRules in priority order
+    fields: dict
+    credit_days: int = None        # due_date = invoice_date + credit_days when no due date is found
+    credit_days_when: str = None   # ...only if this text appears (case-insensitive)
+    # Patterns may continue onto the next line (a label ending its line, value below),
+    # as when the whole text was searched at once
+    spans_lines: bool = False
+
+
+class _CompiledRule:
+    def __init__(self, field, priority, rule):
+        flags = re.IGNORECASE if rule.ignore_case else 0
+        self.field = field
+        self.priority = priority
+        self.rule = rule
+        self.anchor = rule.anchor.lower() if rule.anchor and rule.ignore_case else rule.anchor
+        try:
+            self.pattern = re.compile(rule.pattern, flags) if rule.pattern else None
+            self.next_line = re.compile(rule.next_line, flags) if rule.next_line else None
+        except re.error as e:
+            raise ValueError(f"Invalid regex in template field {field}: {e}") from e
+
+
+def _match_value(match):
+    groups = [g for g in match.groups() if g] if match.groups() else [match.group()]
+    return " ".join(groups).strip()
+
+
+def _to_ddmmyyyy(value, formats):
+    for fmt in formats:
+        try:
+            return datetime.strptime(value.strip(), fmt).strftime("%d/%m/%Y")
+        except ValueError:
+            continue
+    return None
+
+
+class TemplateExtractor:
+    def __init__(self, template):
+        self.template = template
+        # Registered in SUPPLIER_EXTRACTORS like a function; also keys the extraction cache
+        self.__name__ = self.__qualname__ = f"extract_{template.name}"
+        self._rules = []
+        for field, rules in template.fields.items():
+            rules = rules if isinstance(rules, tuple) else (rules,)
+            self._rules.extend(_CompiledRule(field, priority, rule) for priority, rule in enumerate(rules))
+        self._credit_when = template.credit_days_when.lower() if template.credit_days_when else None
+
+    def _candidates(self, rule, lines, i):
+        # Matches starting on line i; with spans_lines they may run into line i + 1
+        line = lines[i]
+        text = f"{line}\n{lines[i + 1]}" if self.template.spans_lines and i + 1 < len(lines) else line
+        if rule.rule.last:
+            return [m for m in rule.pattern.finditer(text) if m.start() < len(line)]
+        match = rule.pattern.search(text)
+        return [match] if match and match.start() < len(line) else []
+
+    def _scan(self, lines):
+        found = {}
+        credit_applies = self._credit_when is None
+        pending = list(self._rules)
+        for i, line in enumerate(lines):
+            lower = line.lower()
+            if not credit_applies and self._credit_when in lower:
+                credit_applies = True
+            still_pending = []
+            for rule in pending:
+                key = (rule.field, rule.priority)
+                if rule.anchor and rule.anchor not in (lower if rule.rule.ignore_case else line):
+                    still_pending.append(rule)
+                    continue
+                match = None
+                if rule.pattern:
+                    matches = self._candidates(rule, lines, i)
+                    match = matches[-1] if matches else None
+                if not match and rule.next_line and i + 1 < len(lines):
+                    match = rule.next_line.search(lines[i + 1])
+                if match:
+                    found[key] = _match_value(match)
+                if rule.rule.last or not match:
+                    still_pending.append(rule)
+            pending = still_pending
+            if not pending and credit_applies:
+                break
+        return found, credit_applies
+
+    def __call__(self, doc, supplier_name, company_name):
+        found, credit_applies = self._scan(doc.lines)
+
+        values = {}
+        for rule in sorted(self._rules, key=lambda r: r.priority):
+            if values.get(rule.field) is not None:
+                continue
+            value = found.get((rule.field, rule.priority))
+            if value is not None:
+                if rule.rule.date_formats:
+                    parsed = _to_ddmmyyyy(value, rule.rule.date_formats)
+                    value = value if parsed is None and rule.rule.keep_unparsed else parsed
+                elif rule.rule.strip_commas:
+                    value = value.replace(",", "")
+            values[rule.field] = value
+
+        invoice_date = values.get("invoice_date")
+        due_date = values.get("due_date")
+        credit_days = self.template.credit_days
+        if not due_date and invoice_date and credit_days is not None and credit_applies:
+            if credit_days == 0:
+                due_date = invoice_date
+            else:
+                base_date = _to_ddmmyyyy(invoice_date, ("%d/%m/%Y",))
+                if base_date:
+                    due_date = (
+                        datetime.strptime(base_date, "%d/%m/%Y") + timedelta(days=credit_days)
+                    ).strftime("%d/%m/%Y")
+
+        return {
+            "supplier_name": supplier_name,
+            "company_name": company_name,
+            "invoice_no": values.get("invoice_no"),
+            "invoice_date": invoice_date,
+            "due_date": due_date,
+            "amount": values.get("amount"),
+            "reference": values.get("reference")
+        }
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import ocr
+from concurrent.futures import ProcessPoolExecutor
+from extraction_cache import EXTRACTION_CACHE, extraction_key
+from pdf_document import ParsedDocument
+from extractor_registry import SUPPLIER_EXTRACTORS
+
+# ---------------------- Ingestion Engine ----------------------
+# Fans uploaded PDFs out across worker processes (pdfplumber parsing is
+# CPU-bound pure Python). Results come back in upload order and a failing
+# file never takes down the rest of the batch.
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+
+
+class IngestResult:
+    def __init__(self, name, rows=None, error=None):
+        self.name = name
+        self.rows = rows
+        self.error = error
+
+
+def _init_worker():
+    # Files are already spread across cores; don't nest an OCR pool per file
+    ocr.OCR_WORKERS = 1
+
+
+def _extract_rows(extractor, data, supplier_name, company_name, page_workers=1):
+    return extractor(ParsedDocument.from_pdf(data, page_workers), supplier_name, company_name)
+
+
+def ingest_files(files, supplier_name, company_name, is_soa, max_workers=INGEST_WORKERS):
+    # files: list of (file_name, pdf_bytes) in upload order
+    extractor = SUPPLIER_EXTRACTORS[(supplier_name, is_soa)]
+    results = [None] * len(files)
+    pending = []
+
+    for i, (name, data) in enumerate(files):
+        key = extraction_key(data, extractor, supplier_name, company_name)
+        rows = EXTRACTION_CACHE.get(key)
+        if rows is not None:
+            results[i] = IngestResult(name, rows)
+        else:
+            pending.append((i, name, data, key))
+
+    if len(pending) <= 1 or max_workers <= 1:
+        # A lone statement uses the idle cores for its pages instead
+        page_workers = max_workers if is_soa else 1
+        for i, name, data, key in pending:
+            try:
+                rows = _extract_rows(extractor, data, supplier_name, company_name, page_workers)
+            except Exception as e:
+                results[i] = IngestResult(name, error=str(e))
+                continue
+            EXTRACTION_CACHE.set(key, rows)
+            results[i] = IngestResult(name, rows)
+        return results
+
+    # "spawn" keeps workers independent of the Streamlit server's threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(pending)), mp_context=context,
+                             initializer=_init_worker) as pool:
+        futures = [
+            (i, name, key, pool.submit(_extract_rows, extractor, data, supplier_name, company_name))
+            for i, name, data, key in pending
+        ]
+        for i, name, key, future in futures:
+            try:
+                rows = future.result()
+            except Exception as e:
+                results[i] = IngestResult(name, error=str(e))
+                continue
+            EXTRACTION_CACHE.set(key, rows)
+            results[i] = IngestResult(name, rows)
+
+    return results
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from datetime import datetime
+import streamlit as st
+from disk_cache import CACHE_DIR
+from invoice_mirror import SYNC_OVERLAP, get_mirror
+
+# ---------------------- Invoice Key Filter ----------------------
+# Bloom filter over (supplier_name, invoice_no, invoice_date) of every stored
+# invoice, fed from the local mirror and persisted next to it. A key it has
+# never seen is definitely new, so most statement rows skip the Supabase
+# duplicate lookup; only possible hits are looked up. A key inserted by
+# someone else after the last mirror sync can slip through as "new", which
+# the insert path must tolerate (ignore-duplicates upsert).
+
+BLOOM_ERROR_RATE = 0.01
+MIN_CAPACITY = 100_000
+
+
+def invoice_key(supplier_name, invoice_no, invoice_date):
+    return f"{supplier_name}\x1f{invoice_no}\x1f{invoice_date}"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE, size=None, hashes=None, bits=None, count=0):
+        self.capacity = capacity
+        self.size = size or max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count  # distinct keys added (approximately)
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        positions = self._positions(key)
+        if all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions):
+            return
+        for p in positions:
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+class InvoiceKeyFilter:
+    def __init__(self, mirror, path=os.path.join(CACHE_DIR, "invoice_keys.bloom")):
+        self.mirror = mirror
+        self.path = path
+        self._lock = threading.Lock()
+        self.bloom, self.watermark = self._load()
+        self.ready = False
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                header = json.loads(f.readline())
+                bits = bytearray(f.read())
+        except (OSError, ValueError):
+            return None, None
+        bloom = BloomFilter(header["capacity"], size=header["size"], hashes=header["hashes"],
+                            bits=bits, count=header["count"])
+        return bloom, header["watermark"]
+
+    def _save(self):
+        header = {"capacity": self.bloom.capacity, "size": self.bloom.size, "hashes": self.bloom.hashes,
+                  "count": self.bloom.count, "watermark": self.watermark}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            f.write(self.bloom.bits)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self):
+        # True when the filter covers every invoice as of the latest mirror sync
+        with self._lock:
+            if not self.mirror.sync():
+                self.ready = False
+                return False
+            watermark = self.mirror.watermark()
+            if self.bloom is not None and self.bloom.count <= self.bloom.capacity:
+                if watermark == self.watermark:
+                    self.ready = True
+                    return True
+                since = self.watermark and (datetime.fromisoformat(self.watermark) - SYNC_OVERLAP).isoformat()
+            else:
+                # First build, or too full for its error rate: start over, sized with headroom
+                self.bloom = BloomFilter(max(MIN_CAPACITY, 2 * self.mirror.count()))
+                since = None
+
+            for row in self.mirror.iter_rows(updated_since=since):
+                self.bloom.add(invoice_key(row.get("supplier_name"), row.get("invoice_no"), row.get("invoice_date")))
+            self.watermark = watermark
+            self._save()
+            self.ready = True
+            return True
+
+    def might_contain(self, supplier_name, invoice_no, invoice_date):
+        # Without an up-to-date filter every key has to be looked up
+        if not self.ready:
+            return True
+        return invoice_key(supplier_name, invoice_no, invoice_date) in self.bloom
+
+    def add_rows(self, rows):
+        # Our own inserts are known immediately, before the mirror syncs them
+        with self._lock:
+            if self.bloom is None:
+                return
+            for row in rows:
+                self.bloom.add(invoice_key(row.get("supplier_name"), row.get("invoice_no"), row.get("invoice_date")))
+            self._save()
+
+
+@st.cache_resource
+def get_key_filter():
+    return InvoiceKeyFilter(get_mirror())
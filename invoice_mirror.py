@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import requests
+import rollups
+import streamlit as st
+from disk_cache import CACHE_DIR
+from invoice_query import PAGE_SIZE, InvoiceQuery, escape_like, fetch_page, iter_pages, select_columns
+from supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+# ---------------------- Invoice Mirror ----------------------
+# Local SQLite copy of the invoices table. The first sync loads every row;
+# after that only rows with updated_at past the watermark are pulled, and
+# rows listed in invoice_tombstones are dropped (see sql/invoice_mirror.sql).
+# List tabs and the dashboard read from here at local-disk speed, and fall
+# back to querying Supabase directly whenever the mirror can't sync.
+
+MIRROR_ENABLED = os.getenv("INVOICE_MIRROR", "1") == "1"
+MIRROR_SYNC_SECONDS = float(os.getenv("MIRROR_SYNC_SECONDS", "5"))
+MIRROR_RETRY_SECONDS = 300
+
+# Re-pull a window behind the watermark: rows committed out of updated_at
+# order (concurrent transactions) are still picked up. Upserts are idempotent.
+SYNC_OVERLAP = timedelta(seconds=60)
+SYNC_PAGE_SIZE = 1000
+
+# Columns the tab filters use, stored next to the JSON row for indexed lookups
+FILTER_COLUMNS = ("supplier_name", "company_name", "status", "paid_via", "invoice_date", "updated_at")
+
+
+class InvoiceMirror:
+    def __init__(self, client, path=os.path.join(CACHE_DIR, "invoice_mirror.sqlite3")):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+        self._synced_at = 0.0
+        self._failed_at = None
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS invoices (id INTEGER PRIMARY KEY, "
+                + ", ".join(f"{column} TEXT" for column in FILTER_COLUMNS)
+                + ", row TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS invoices_status_date ON invoices (status, invoice_date)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            rollups.create_tables(conn)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ---------------------- Sync ----------------------
+
+    def sync(self, max_age=MIRROR_SYNC_SECONDS):
+        # True when reads can be served locally
+        if not MIRROR_ENABLED:
+            return False
+        with self._lock:
+            now = time.time()
+            if now - self._synced_at < max_age:
+                return True
+            if self._failed_at and now - self._failed_at < MIRROR_RETRY_SECONDS:
+                return False
+            try:
+                self._pull()
+            except (requests.RequestException, KeyError, ValueError) as e:
+                logger.warning("Invoice mirror sync failed, reading from Supabase: %s", e)
+                self._failed_at = now
+                return False
+            self._synced_at = time.time()
+            self._failed_at = None
+            return True
+
+    def expire(self):
+        # Called after our own writes so the next read pulls them in
+        self._synced_at = 0.0
+
+    def _stored_rows(self, conn, ids):
+        # Current local versions of these ids (SQLite caps bound parameters)
+        ids = list(ids)
+        found = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            found += [json.loads(r) for (r,) in conn.execute(
+                f"SELECT row FROM invoices WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+            )]
+        return found
+
+    def _pull(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+            watermark = datetime.fromisoformat(row[0]) if row else None
+            since = (watermark - SYNC_OVERLAP).isoformat() if watermark else None
+
+            row = conn.execute("SELECT value FROM meta WHERE key = 'rollup_version'").fetchone()
+            if not row or row[0] != rollups.ROLLUP_VERSION:
+                rollups.rebuild(conn, (json.loads(r) for (r,) in conn.execute("SELECT row FROM invoices").fetchall()))
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollup_version', ?)",
+                             (rollups.ROLLUP_VERSION,))
+
+            latest = watermark
+            for rows in iter_pages(self.client, InvoiceQuery(updated_since=since), SYNC_PAGE_SIZE):
+                # Swap each row's old rollup contribution for its new one
+                rollups.apply(conn, self._stored_rows(conn, (r["id"] for r in rows)), rows)
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO invoices (id, {', '.join(FILTER_COLUMNS)}, row) "
+                    f"VALUES (?, {', '.join('?' for _ in FILTER_COLUMNS)}, ?)",
+                    [(r["id"], *(r.get(column) for column in FILTER_COLUMNS), json.dumps(r)) for r in rows]
+                )
+                for r in rows:
+                    updated_at = datetime.fromisoformat(r["updated_at"])
+                    latest = updated_at if latest is None or updated_at > latest else latest
+
+            if since:
+                # The first full load has nothing to delete
+                deleted = self._tombstones(since)
+                rollups.apply(conn, self._stored_rows(conn, deleted), [])
+                conn.executemany("DELETE FROM invoices WHERE id = ?", [(i,) for i in deleted])
+            if latest:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)", (latest.isoformat(),))
+
+    def _tombstones(self, since):
+        ids, after = [], None
+        while True:
+            params = [("select", "id"), ("deleted_at", f"gte.{since}"), ("order", "id.asc"),
+                      ("limit", str(SYNC_PAGE_SIZE))]
+            if after is not None:
+                params.append(("id", f"gt.{after}"))
+            res = self.client.get("invoice_tombstones", params=params)
+            res.raise_for_status()
+            rows = res.json()
+            if not rows:
+                return ids
+            ids.extend(r["id"] for r in rows)
+            after = rows[-1]["id"]
+
+    # ---------------------- Reads ----------------------
+
+    def watermark(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+        return row[0] if row else None
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+
+    def iter_rows(self, updated_since=None):
+        # Every local row, or those updated at/after an ISO timestamp
+        where, args = (" WHERE updated_at >= ?", (updated_since,)) if updated_since else ("", ())
+        with self._connect() as conn:
+            cursor = conn.execute(f"SELECT row FROM invoices{where}", args)
+            while True:
+                batch = cursor.fetchmany(SYNC_PAGE_SIZE)
+                if not batch:
+                    return
+                for (r,) in batch:
+                    yield json.loads(r)
+
+    def read_rollups(self):
+        # (rollup rows, aging basis rows, generation)
+        with self._connect() as conn:
+            return (*rollups.read(conn), rollups.generation(conn))
+
+    # Same contract as invoice_query.fetch_page / iter_pages
+
+    def fetch_page(self, query, after=None, page_size=PAGE_SIZE):
+        clauses, args = [], []
+        if query.status:
+            clauses.append("status = ?")
+            args.append(query.status)
+        for column, text in (("supplier_name", query.supplier), ("company_name", query.company),
+                             ("paid_via", query.paid_via)):
+            if text:
+                # SQLite LIKE is case-insensitive for ASCII, like ilike
+                clauses.append(f"{column} LIKE ? ESCAPE '\\'")
+                args.append(f"%{escape_like(text)}%")
+        if query.date_from:
+            clauses.append("invoice_date >= ?")
+            args.append(str(query.date_from))
+        if query.date_to:
+            clauses.append("invoice_date <= ?")
+            args.append(str(query.date_to))
+        if after is not None:
+            clauses.append("id > ?")
+            args.append(after)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._connect() as conn:
+            found = conn.execute(f"SELECT row FROM invoices{where} ORDER BY id LIMIT ?", (*args, page_size + 1))
+            rows = [json.loads(r) for (r,) in found]
+
+        columns = select_columns(query)
+        if "*" not in columns:
+            rows = [{column: r.get(column) for column in columns} for r in rows]
+        if len(rows) > page_size:
+            return rows[:page_size], rows[page_size - 1]["id"]
+        return rows, None
+
+    def iter_pages(self, query, page_size=PAGE_SIZE):
+        after = None
+        while True:
+            rows, after = self.fetch_page(query, after, page_size)
+            if rows:
+                yield rows
+            if after is None:
+                return
+
+
+@st.cache_resource
+def get_mirror():
+    # One mirror (and sync lock) per server process
+    return InvoiceMirror(get_supabase())
+
+
+def read_page(query, after=None, page_size=PAGE_SIZE):
+    mirror = get_mirror()
+    if mirror.sync():
+        return mirror.fetch_page(query, after, page_size)
+    return fetch_page(get_supabase(), query, after, page_size)
+
+
+def read_pages(query, page_size=PAGE_SIZE):
+    mirror = get_mirror()
+    if mirror.sync():
+        return mirror.iter_pages(query, page_size)
+    return iter_pages(get_supabase(), query, page_size)
@@ -0,0 +1,83 @@
+import os
+from dataclasses import dataclass
+
+# ---------------------- Invoice Queries ----------------------
+# Tab filters turned into PostgREST predicates, so the server returns one
+# page of the requested columns instead of the whole table being filtered in
+# pandas. Pages use keyset pagination on id (id > last id seen), which stays
+# fast however deep the user pages.
+
+PAGE_SIZE = int(os.getenv("INVOICE_PAGE_SIZE", "200"))
+
+
+@dataclass(frozen=True)
+class InvoiceQuery:
+    columns: tuple = ("*",)
+    status: str = None
+    supplier: str = ""      # substring, case-insensitive (like str.contains(case=False))
+    company: str = ""
+    paid_via: str = ""
+    date_from: object = None  # inclusive invoice_date bounds (date or YYYY-MM-DD)
+    date_to: object = None
+    updated_since: str = None  # ISO timestamp, inclusive (mirror delta sync)
+
+
+def escape_like(text):
+    # LIKE wildcards typed by the user are matched literally
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def select_columns(query):
+    columns = tuple(query.columns)
+    if "*" not in columns and "id" not in columns:
+        # id is the pagination key
+        columns = ("id",) + columns
+    return columns
+
+
+def query_params(query, after=None, limit=PAGE_SIZE):
+    params = [("select", ",".join(select_columns(query)))]
+    if query.status:
+        params.append(("status", f"eq.{query.status}"))
+    if query.supplier:
+        params.append(("supplier_name", f"ilike.*{escape_like(query.supplier)}*"))
+    if query.company:
+        params.append(("company_name", f"ilike.*{escape_like(query.company)}*"))
+    if query.paid_via:
+        params.append(("paid_via", f"ilike.*{escape_like(query.paid_via)}*"))
+    if query.date_from:
+        params.append(("invoice_date", f"gte.{query.date_from}"))
+    if query.date_to:
+        params.append(("invoice_date", f"lte.{query.date_to}"))
+    if query.updated_since:
+        params.append(("updated_at", f"gte.{query.updated_since}"))
+    if after is not None:
+        params.append(("id", f"gt.{after}"))
+    params += [("order", "id.asc"), ("limit", str(limit))]
+    return params
+
+
+def fetch_page(client, query, after=None, page_size=PAGE_SIZE):
+    # Returns (rows, cursor of the next page or None on the last page).
+    # A failed request raises, so an outage never looks like an empty result.
+    res = client.get("invoices", params=query_params(query, after, page_size + 1))
+    res.raise_for_status()
+    rows = res.json()
+    if len(rows) > page_size:
+        return rows[:page_size], rows[page_size - 1]["id"]
+    return rows, None
+
+
+def iter_pages(client, query, page_size=PAGE_SIZE):
+    # Streams every matching row, one keyset page at a time. PostgREST's
+    # max-rows can silently return fewer rows than asked for, so only an
+    # empty page marks the end; a failed page raises instead of truncating.
+    after = None
+    while True:
+        res = client.get("invoices", params=query_params(query, after, page_size))
+        res.raise_for_status()
+        rows = res.json()
+        if not rows:
+            return
+        yield rows
+        after = rows[-1]["id"]
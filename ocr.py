@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import pdfplumber
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from disk_cache import DiskCache, content_hash
+
+# ---------------------- OCR ----------------------
+# OCR text is cached on disk per page so a rerun never re-OCRs a page, and
+# uncached pages of a scanned invoice are OCRed in parallel worker processes.
+
+OCR_CACHE = DiskCache(
+    "ocr",
+    max_bytes=int(os.getenv("OCR_CACHE_MB", "64")) * 1024 * 1024
+)
+
+# Set to 1 inside ingestion workers so pools are never nested
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+
+
+# Region of interest an extractor wants OCRed instead of the whole page.
+# bbox is (x0, top, x1, bottom) as fractions of the page size. With an anchor,
+# the region is instead a full-width band starting at every text-layer match
+# of the anchor and extending `height` (fraction of the page) below it.
+OcrRegion = namedtuple("OcrRegion", ["bbox", "anchor", "height"], defaults=(None, None, 0.05))
+
+
+def page_key(doc_hash, page_number, resolution, regions=None):
+    # A page is identified by the hash of its document's bytes and its position
+    return f"{doc_hash}|{page_number}|{resolution}|{regions!r}"
+
+
+def _region_boxes(page, regions):
+    boxes = []
+    for region in regions:
+        if region.anchor:
+            for match in page.search(region.anchor, regex=False):
+                bottom = min(page.height, match["bottom"] + region.height * page.height)
+                boxes.append((0, match["top"], page.width, bottom))
+        elif region.bbox:
+            x0, top, x1, bottom = region.bbox
+            boxes.append((x0 * page.width, top * page.height, x1 * page.width, bottom * page.height))
+    return boxes
+
+
+def _render_and_ocr(pdf, page_number, resolution, regions=None):
+    # Imported on first OCR, not whenever an extractor module is loaded
+    import pytesseract
+    page = pdf.pages[page_number]
+    boxes = _region_boxes(page, regions) if regions else []
+    if not boxes:
+        image = page.to_image(resolution=resolution).original
+        return pytesseract.image_to_string(image)
+    # Only the cropped areas are rasterised, in declaration order
+    texts = []
+    for box in boxes:
+        image = page.crop(box).to_image(resolution=resolution).original
+        texts.append(pytesseract.image_to_string(image))
+    return "\n".join(texts)
+
+
+def _ocr_page(data, page_number, resolution, regions=None):
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        return _render_and_ocr(pdf, page_number, resolution, regions)
+
+
+def ocr_pages(doc, page_numbers, resolution=300, regions=None):
+    doc_hash = content_hash(doc.data)
+    texts = {}
+    missing = []
+    for page_number in page_numbers:
+        text = OCR_CACHE.get(page_key(doc_hash, page_number, resolution, regions))
+        if text is None:
+            missing.append(page_number)
+        else:
+            texts[page_number] = text
+
+    if len(missing) > 1 and OCR_WORKERS > 1:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(OCR_WORKERS, len(missing)), mp_context=context) as pool:
+            futures = [pool.submit(_ocr_page, doc.data, page_number, resolution, regions) for page_number in missing]
+            fresh = [future.result() for future in futures]
+    elif missing:
+        with doc.open() as pdf:
+            fresh = [_render_and_ocr(pdf, page_number, resolution, regions) for page_number in missing]
+    else:
+        fresh = []
+
+    for page_number, text in zip(missing, fresh):
+        OCR_CACHE.set(page_key(doc_hash, page_number, resolution, regions), text)
+        texts[page_number] = text
+
+    return [texts[page_number] for page_number in page_numbers]
+
+
+# ---------------------- Adaptive OCR ----------------------
+# Try the PDF's own text layer first, then OCR at increasing resolutions, only
+# for pages whose text still doesn't contain the extractor's required fields.
+# With regions, the crops are OCRed once at the lowest resolution and the
+# full page at the highest resolution is the only fallback: re-cropping the
+# same boxes at a higher resolution can't find a field outside them. Crops may
+# also demand more (accept_regions) than the full page does.
+
+OCR_RESOLUTIONS = (150, 300)
+
+
+def adaptive_page_texts(doc, page_numbers, accept, resolutions=OCR_RESOLUTIONS, regions=None,
+                        accept_regions=None):
+    # Returns [(text, tier)] in page order; tier is "text", "ocr@<dpi>",
+    # "regions@<dpi>" or "unmatched"
+    accept_regions = accept_regions or accept
+    results = {}
+    pending = []
+    for page_number in page_numbers:
+        text = doc.pages[page_number].text
+        if text and accept(text):
+            results[page_number] = (text, "text")
+        else:
+            pending.append(page_number)
+
+    if regions:
+        tiers = [(resolutions[0], regions), (resolutions[-1], None)]
+    else:
+        tiers = [(resolution, None) for resolution in resolutions]
+
+    for resolution, tier_regions in tiers:
+        if not pending:
+            break
+        still_failing = []
+        tier = f"{'regions' if tier_regions else 'ocr'}@{resolution}"
+        tier_accept = accept_regions if tier_regions else accept
+        for page_number, text in zip(pending, ocr_pages(doc, pending, resolution, tier_regions)):
+            # Pages that never pass keep the last attempt
+            results[page_number] = (text, tier)
+            if not tier_accept(text):
+                still_failing.append(page_number)
+        pending = still_failing
+
+    for page_number in pending:
+        results[page_number] = (results[page_number][0], "unmatched")
+    return [results[page_number] for page_number in page_numbers]
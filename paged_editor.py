@@ -0,0 +1,100 @@
+import hashlib
+import pandas as pd
+import streamlit as st
+
+# ---------------------- Paged Editor ----------------------
+# st.data_editor over one window (page) of rows at a time. Edits go into a
+# sparse change log in session_state keyed by row id, so they survive paging
+# and reruns while only the visible window is sent to the browser. Only the
+# rows the editor reports as touched (its edited_rows state) are diffed.
+
+
+class ChangeLog:
+    def __init__(self):
+        self.changes = {}    # id -> {column: new value}
+        self.originals = {}  # id -> row as loaded, for conflict checks on save
+
+    def set(self, row_id, column, value, original_row, default=None):
+        # Setting a cell back to its loaded value drops it from the log
+        changes = self.changes.setdefault(row_id, {})
+        if value == original_row.get(column, default):
+            changes.pop(column, None)
+        else:
+            changes[column] = value
+        if changes:
+            self.originals.setdefault(row_id, original_row)
+        else:
+            del self.changes[row_id]
+            self.originals.pop(row_id, None)
+
+    def value(self, row_id, column, default=None):
+        if column in self.changes.get(row_id, {}):
+            return self.changes[row_id][column]
+        return self.originals.get(row_id, {}).get(column, default)
+
+    def ids_where(self, column, value):
+        return [row_id for row_id, changes in self.changes.items() if changes.get(column) == value]
+
+    def discard(self, row_ids):
+        for row_id in row_ids:
+            self.changes.pop(row_id, None)
+            self.originals.pop(row_id, None)
+
+    def clear(self):
+        self.changes.clear()
+        self.originals.clear()
+
+    def __len__(self):
+        return len(self.changes)
+
+
+def get_change_log(key):
+    return st.session_state.setdefault(f"{key}_changes", ChangeLog())
+
+
+def set_column(key, rows, column, value, defaults=None, index="id"):
+    # e.g. "select all on this page": one log entry per row of the window
+    log = get_change_log(key)
+    for row in rows:
+        log.set(row[index], column, value, row, (defaults or {}).get(column))
+
+
+def paged_editor(rows, key, columns, editable, defaults=None, index="id", column_config=None):
+    # rows: the current window as dicts with an `index` column.
+    # defaults: extra editor-only columns (e.g. a select checkbox) and their initial value.
+    # Returns (window frame with logged edits applied, change log).
+    defaults = defaults or {}
+    log = get_change_log(key)
+    originals = {row[index]: row for row in rows}
+    ids = list(originals)
+
+    # A different window (page, filter or reloaded data) gets a fresh editor widget
+    window = hashlib.blake2b(repr(rows).encode(), digest_size=8).hexdigest()
+    editor_key = f"{key}_editor_{window}"
+
+    # Edits from the last interaction: only touched cells, by row position
+    for position, changes in st.session_state.get(editor_key, {}).get("edited_rows", {}).items():
+        row_id = ids[int(position)]
+        for column, value in changes.items():
+            log.set(row_id, column, value, originals[row_id], defaults.get(column))
+
+    frame = pd.DataFrame(rows, columns=[index, *(c for c in columns if c not in defaults)]).set_index(index)
+    for column, value in defaults.items():
+        frame[column] = value
+    for row_id in ids:
+        for column, value in log.changes.get(row_id, {}).items():
+            if column in frame.columns:
+                frame.at[row_id, column] = value
+    frame = frame[list(columns)]
+
+    st.data_editor(
+        frame,
+        key=editor_key,
+        use_container_width=True,
+        hide_index=True,
+        num_rows="fixed",
+        column_order=list(columns),
+        column_config=column_config,
+        disabled=[column for column in columns if column not in editable]
+    )
+    return frame, log
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import pdfplumber
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+# ---------------------- Parsed Document ----------------------
+# A PDF is parsed once per upload; every extractor (and the AI fallback)
+# reads the cached page text instead of re-opening the file.
+
+# Long statements can have their pages extracted in parallel; below this many
+# pages per worker the process start-up costs more than it saves.
+MIN_PAGES_PER_WORKER = 8
+
+
+def read_pdf_bytes(file):
+    # Accepts a path, raw bytes or a file-like object (e.g. Streamlit UploadedFile)
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            return f.read()
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    file.seek(0)
+    return file.read()
+
+
+class ParsedPage:
+    def __init__(self, number, text):
+        self.number = number
+        self.text = text or ""
+        self.lines = self.text.splitlines()
+        self.words = [word for line in self.lines for word in line.split()]
+
+
+def _extract_page_range(data, start, stop):
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        return [ParsedPage(i, pdf.pages[i].extract_text()) for i in range(start, stop)]
+
+
+def _extract_pages_parallel(data, page_count, page_workers):
+    workers = min(page_workers, page_count // MIN_PAGES_PER_WORKER)
+    chunk = -(-page_count // workers)
+    ranges = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=context) as pool:
+        futures = [pool.submit(_extract_page_range, data, start, stop) for start, stop in ranges]
+        # Contiguous ranges, collected in submission order => pages stay in order
+        return [page for future in futures for page in future.result()]
+
+
+class ParsedDocument:
+    def __init__(self, pages, data=b""):
+        self.pages = pages
+        self.data = data
+        self.text = "\n".join(page.text for page in pages if page.text)
+        self.lines = [line for page in pages for line in page.lines]
+
+    @classmethod
+    def from_pdf(cls, file, page_workers=1, max_pages=None):
+        # Only text extraction runs in parallel; extractors still match over the
+        # merged, ordered pages, so multi-line carry-over behaves as before.
+        data = read_pdf_bytes(file)
+        with pdfplumber.open(BytesIO(data)) as pdf:
+            page_count = len(pdf.pages) if max_pages is None else min(len(pdf.pages), max_pages)
+            if page_workers <= 1 or page_count < 2 * MIN_PAGES_PER_WORKER:
+                pages = [ParsedPage(i, pdf.pages[i].extract_text()) for i in range(page_count)]
+                return cls(pages, data)
+        return cls(_extract_pages_parallel(data, page_count, page_workers), data)
+
+    def open(self):
+        # Re-open the original PDF, only needed for rendering (OCR)
+        return pdfplumber.open(BytesIO(self.data))
@@ -0,0 +1,121 @@
+# ---------------------- Dashboard Rollups ----------------------
+# Aggregates kept inside the invoice mirror and maintained incrementally:
+# every synced row subtracts its previous contribution and adds its new one
+# in the same transaction, and tombstoned rows subtract theirs. The dashboard
+# reads a few hundred aggregate rows instead of scanning every invoice.
+#
+#   rollups       (month, status, supplier, company)               -> count, amount
+#   aging_basis   (supplier, invoice_date, due_date, closed_date)  -> count, amount
+#
+# closed_date is when a Paid invoice stopped being outstanding ("" for Unpaid),
+# so aging can be computed as of any past date, not only today.
+#
+# Amounts are integer cents so repeated add/subtract never drifts. Missing
+# key values are stored as "" (NULLs would never collide on the primary key).
+
+ROLLUP_VERSION = "2"
+
+# Paid invoices without a paid_date never count as outstanding
+CLOSED_UNKNOWN = "1900-01-01"
+
+
+def create_tables(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS rollups (month TEXT, status TEXT, supplier_name TEXT, company_name TEXT, "
+        "invoice_count INTEGER NOT NULL, amount_cents INTEGER NOT NULL, "
+        "PRIMARY KEY (month, status, supplier_name, company_name))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS aging_basis (supplier_name TEXT, invoice_date TEXT, due_date TEXT, "
+        "closed_date TEXT, invoice_count INTEGER NOT NULL, amount_cents INTEGER NOT NULL, "
+        "PRIMARY KEY (supplier_name, invoice_date, due_date, closed_date))"
+    )
+
+
+def _cents(amount):
+    try:
+        return round(float(amount) * 100)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _contributions(row, sign):
+    supplier = row.get("supplier_name") or ""
+    company = row.get("company_name") or ""
+    cents = sign * _cents(row.get("amount"))
+    invoice_date = (row.get("invoice_date") or "")[:10]
+    yield "rollups", (invoice_date[:7], row.get("status") or "", supplier, company), sign, cents
+    if row.get("status") in ("Paid", "Unpaid"):
+        closed = (row.get("paid_date") or CLOSED_UNKNOWN)[:10] if row.get("status") == "Paid" else ""
+        yield "aging_basis", (supplier, invoice_date, (row.get("due_date") or "")[:10], closed), sign, cents
+
+
+_UPSERT = {
+    "rollups": (
+        "INSERT INTO rollups (month, status, supplier_name, company_name, invoice_count, amount_cents) "
+        "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (month, status, supplier_name, company_name) DO UPDATE SET "
+        "invoice_count = invoice_count + excluded.invoice_count, amount_cents = amount_cents + excluded.amount_cents"
+    ),
+    "aging_basis": (
+        "INSERT INTO aging_basis (supplier_name, invoice_date, due_date, closed_date, invoice_count, amount_cents) "
+        "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (supplier_name, invoice_date, due_date, closed_date) DO UPDATE SET "
+        "invoice_count = invoice_count + excluded.invoice_count, amount_cents = amount_cents + excluded.amount_cents"
+    ),
+}
+
+
+def apply(conn, removed, added):
+    # removed: previous versions of changed/deleted rows; added: new versions.
+    # Returns True when any aggregate changed (re-pulled rows cancel out).
+    deltas = {}
+    for rows, sign in ((removed, -1), (added, 1)):
+        for row in rows:
+            for table, key, count, cents in _contributions(row, sign):
+                total = deltas.setdefault((table, key), [0, 0])
+                total[0] += count
+                total[1] += cents
+    changed = False
+    for table in _UPSERT:
+        params = [(*key, count, cents) for (t, key), (count, cents) in deltas.items()
+                  if t == table and (count or cents)]
+        conn.executemany(_UPSERT[table], params)
+        conn.execute(f"DELETE FROM {table} WHERE invoice_count = 0")
+        changed = changed or bool(params)
+    if changed:
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('rollup_generation', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+        )
+    return changed
+
+
+def rebuild(conn, rows):
+    # Recreated rather than emptied: a new ROLLUP_VERSION may change the schema
+    conn.execute("DROP TABLE IF EXISTS rollups")
+    conn.execute("DROP TABLE IF EXISTS aging_basis")
+    conn.execute("DROP TABLE IF EXISTS unpaid_by_due")
+    create_tables(conn)
+    apply(conn, [], rows)
+
+
+def generation(conn):
+    # Bumped on every change, so cached results derived from the rollups can key on it
+    row = conn.execute("SELECT value FROM meta WHERE key = 'rollup_generation'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def read(conn):
+    # Returns (rollup rows, aging basis rows) with amounts in dollars
+    rollup_rows = [
+        (month, status, supplier, company, count, cents / 100)
+        for month, status, supplier, company, count, cents in conn.execute(
+            "SELECT month, status, supplier_name, company_name, invoice_count, amount_cents FROM rollups"
+        )
+    ]
+    basis_rows = [
+        (supplier, invoice_date, due_date, closed_date, count, cents / 100)
+        for supplier, invoice_date, due_date, closed_date, count, cents in conn.execute(
+            "SELECT supplier_name, invoice_date, due_date, closed_date, invoice_count, amount_cents FROM aging_basis"
+        )
+    ]
+    return rollup_rows, basis_rows
@@ -0,0 +1,39 @@
+-- Delta sync support for the local invoice mirror (invoice_mirror.py).
+-- Run once in the Supabase SQL editor. Until it is applied the app keeps
+-- reading invoices straight from Supabase.
+
+-- updated_at doubles as the created watermark: inserts get now() by default
+ALTER TABLE invoices ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS invoices_updated_at ON invoices (updated_at);
+
+CREATE OR REPLACE FUNCTION touch_invoice_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS invoices_touch_updated_at ON invoices;
+CREATE TRIGGER invoices_touch_updated_at
+    BEFORE UPDATE ON invoices
+    FOR EACH ROW EXECUTE FUNCTION touch_invoice_updated_at();
+
+-- Tombstones let the mirror drop rows deleted since its last sync
+CREATE TABLE IF NOT EXISTS invoice_tombstones (
+    id bigint PRIMARY KEY,
+    deleted_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS invoice_tombstones_deleted_at ON invoice_tombstones (deleted_at);
+
+CREATE OR REPLACE FUNCTION record_invoice_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO invoice_tombstones (id) VALUES (OLD.id)
+    ON CONFLICT (id) DO UPDATE SET deleted_at = now();
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS invoices_record_tombstone ON invoices;
+CREATE TRIGGER invoices_record_tombstone
+    AFTER DELETE ON invoices
+    FOR EACH ROW EXECUTE FUNCTION record_invoice_tombstone();
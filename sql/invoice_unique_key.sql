@@ -0,0 +1,8 @@
+-- Unique invoice key used by bulk inserts (bulk_ops.bulk_insert) to skip rows
+-- that already exist, which makes re-sending a failed chunk safe.
+-- Remove existing duplicates first, or the index creation fails:
+--   SELECT supplier_name, invoice_no, invoice_date, count(*)
+--   FROM invoices GROUP BY 1, 2, 3 HAVING count(*) > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS invoices_supplier_invoice_no_date
+    ON invoices (supplier_name, invoice_no, invoice_date);
@@ -0,0 +1,190 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+# ---------------------- Supabase Client ----------------------
+# One keep-alive requests.Session per server process: connections to the
+# Supabase REST endpoint are pooled and reused across calls, tabs and reruns
+# instead of paying a TCP+TLS handshake on every request.
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_API_KEY = os.getenv("SUPABASE_API_KEY")
+
+# (connect, read) seconds
+SUPABASE_TIMEOUT = (
+    float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "3.05")),
+    float(os.getenv("SUPABASE_READ_TIMEOUT", "15"))
+)
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+
+# ---------------------- Resilience ----------------------
+# Idempotent calls are retried with jittered exponential backoff on
+# connection errors, timeouts and 429/502/503/504. After enough consecutive
+# failures the circuit opens and calls fail fast until a trial call succeeds.
+
+MAX_RETRIES = int(os.getenv("SUPABASE_MAX_RETRIES", "3"))
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4.0
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "DELETE"}
+
+BREAKER_THRESHOLD = int(os.getenv("SUPABASE_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("SUPABASE_BREAKER_COOLDOWN", "30"))
+
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # Half-open: let one trial call through per cooldown
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        # Returns True when this failure opened the circuit
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    @property
+    def state(self):
+        return "closed" if self.opened_at is None else "open"
+
+
+class ClientStats:
+    def __init__(self, window=500):
+        self.counts = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0, "circuit_opened": 0}
+        self.latencies = deque(maxlen=window)  # seconds, most recent calls
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.counts["requests"] += 1
+            self.latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            snapshot = dict(self.counts)
+        for label, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            snapshot[label] = round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1) if latencies else None
+        return snapshot
+
+
+def _retry_delay(attempt, response=None):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_CAP)
+    # Full jitter keeps concurrent reruns from retrying in lockstep
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class SupabaseClient:
+    def __init__(self, url=SUPABASE_URL, api_key=SUPABASE_API_KEY, timeout=SUPABASE_TIMEOUT,
+                 pool_size=SUPABASE_POOL_SIZE, max_retries=MAX_RETRIES):
+        self.base_url = f"{url}/rest/v1"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker()
+        self.stats = ClientStats()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "apikey": api_key,
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def request(self, method, path, prefer=None, headers=None, idempotent=None, **kwargs):
+        # path is relative to /rest/v1, e.g. "invoices?status=eq.Paid".
+        # Pass idempotent=True for writes that are safe to repeat.
+        headers = dict(headers or {})
+        if prefer:
+            headers["Prefer"] = prefer
+        kwargs.setdefault("timeout", self.timeout)
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.max_retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self.stats.count("rejected")
+                raise CircuitOpenError("Supabase is unavailable; failing fast while the circuit is open")
+
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                response = self.session.request(method, f"{self.base_url}/{path}", headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            self.stats.record_latency(time.perf_counter() - started)
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                elif self.breaker.record_failure():
+                    self.stats.count("circuit_opened")
+                return response
+
+            # 429 means busy, not down
+            if response is None or response.status_code != 429:
+                if self.breaker.record_failure():
+                    self.stats.count("circuit_opened")
+            if attempt == attempts - 1:
+                self.stats.count("failures")
+                if error is not None:
+                    raise error
+                return response
+            self.stats.count("retries")
+            time.sleep(_retry_delay(attempt, response))
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+
+@st.cache_resource
+def get_supabase():
+    # Shared by every session and rerun of this Streamlit server
+    return SupabaseClient()
@@ -0,0 +1,124 @@
+import re
+from disk_cache import content_hash
+from extraction_cache import EXTRACTION_CACHE
+from pdf_document import ParsedDocument
+from extractor_registry import EXTRACTOR_VERSION, SUPPLIER_EXTRACTORS
+
+# ---------------------- Supplier Detection ----------------------
+# Index of distinctive tokens per supplier, built once at import. A PDF is
+# classified from the words on its first pages with dict lookups only, so a
+# mixed batch can be uploaded without picking a supplier first.
+
+# Extra signals beyond the words of the supplier's own name.
+# "name_words": False indexes only the signature, not the name's words
+SUPPLIER_SIGNATURES = {
+    "Food Xervices": {"prefixes": ["FXINVX-"]},
+    "Gan Teck Kar Investments": {"prefixes": ["SXI.SG"]},
+    "Over Foods": {"prefixes": ["SINV"]},
+    "1800 NO PESTS": {"tokens": ["InvoiceNumber", "InvoiceDate", "TOTALSGD"]},
+    "Double Chin Food": {"patterns": [r"SI\d{4,}"]},
+    "Equipmax": {"patterns": [r"INV\d{4}/\d{3}"]},
+    "Dawood Exports": {"tokens": ["Dawood"]},
+    # Electricity account of the customer's own outlet: "Tipo Novena" is who
+    # other suppliers bill, so only the account number identifies it
+    "Electric Tipo Novena - RR60063": {"tokens": ["RR60063"], "name_words": False},
+}
+
+# Words in supplier names too common on any invoice to tell suppliers apart
+# ("Amount carried over", "Over 90 days", "Pro forma", "Fine print", ...)
+GENERIC_WORDS = {
+    "food", "foods", "group", "singapore", "investments", "exports", "pte", "ltd", "the", "and",
+    "over", "air", "pro", "fine", "double", "perfect", "electric", "factory", "1800",
+}
+
+# A word of the supplier's name counts less than an explicit signature
+NAME_WEIGHT = 1
+SIGNATURE_WEIGHT = 2
+
+DETECTION_WORDS = 600  # only the head of the document is inspected
+DETECTION_PAGES = 2
+DETECTION_VERSION = 3  # bump when the index or scoring changes; part of the cache key
+
+_PUNCTUATION = ".,:;()[]{}\"'"
+
+
+def _normalize(word):
+    return word.strip(_PUNCTUATION).lower()
+
+
+def _name_words(name):
+    return {_normalize(word) for word in re.split(r"[\s\-]+", name)}
+
+
+def _build_index():
+    suppliers = sorted({supplier for supplier, _ in SUPPLIER_EXTRACTORS})
+    token_owners = {}
+    for supplier in suppliers:
+        signature = SUPPLIER_SIGNATURES.get(supplier, {})
+        words = dict.fromkeys(_name_words(supplier), NAME_WEIGHT) if signature.get("name_words", True) else {}
+        words.update((_normalize(token), SIGNATURE_WEIGHT) for token in signature.get("tokens", []))
+        for word, weight in words.items():
+            if len(word) >= 3 and word not in GENERIC_WORDS:
+                token_owners.setdefault(word, {})[supplier] = weight
+    # A token shared by several suppliers identifies none of them
+    tokens = {token: owners.popitem() for token, owners in token_owners.items() if len(owners) == 1}
+
+    prefixes = {}
+    patterns = []
+    for supplier, signature in SUPPLIER_SIGNATURES.items():
+        for prefix in signature.get("prefixes", []):
+            prefixes.setdefault(len(prefix), {})[prefix.lower()] = supplier
+        for pattern in signature.get("patterns", []):
+            patterns.append((re.compile(pattern), supplier))
+    return tokens, prefixes, patterns
+
+
+TOKEN_INDEX, PREFIX_INDEX, PATTERN_INDEX = _build_index()
+
+
+def detect_supplier(doc, company_name=None):
+    # Returns (supplier_name, is_soa) or None when no supplier clearly wins.
+    # Words of the billed company's name are on every document, so they never score.
+    ignored = _name_words(company_name) if company_name else set()
+    words = [word for page in doc.pages for word in page.words][:DETECTION_WORDS]
+    signals = set()
+    lowered = set()
+    for word in words:
+        norm = _normalize(word)
+        lowered.add(norm)
+        if norm in ignored:
+            continue
+        if norm in TOKEN_INDEX:
+            supplier, weight = TOKEN_INDEX[norm]
+            signals.add((supplier, norm, weight))
+        for length, owners in PREFIX_INDEX.items():
+            supplier = owners.get(norm[:length])
+            if supplier:
+                signals.add((supplier, norm[:length], SIGNATURE_WEIGHT))
+        for pattern, supplier in PATTERN_INDEX:
+            if pattern.fullmatch(word.strip(_PUNCTUATION)):
+                signals.add((supplier, pattern.pattern, SIGNATURE_WEIGHT))
+
+    scores = {}
+    for supplier, _, weight in signals:
+        scores[supplier] = scores.get(supplier, 0) + weight
+    if not scores:
+        return None
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if len(ranked) > 1 and ranked[0][1] == ranked[1][1]:
+        return None
+    supplier = ranked[0][0]
+
+    kinds = {is_soa for name, is_soa in SUPPLIER_EXTRACTORS if name == supplier}
+    is_soa = kinds.pop() if len(kinds) == 1 else "statement" in lowered
+    return supplier, is_soa
+
+
+def detect_pdf_supplier(data, company_name=None):
+    key = f"{content_hash(data)}|{company_name}|detect@v{EXTRACTOR_VERSION}.{DETECTION_VERSION}"
+    cached = EXTRACTION_CACHE.get(key)
+    if cached is not None:
+        return tuple(cached["match"]) if cached["match"] else None
+    match = detect_supplier(ParsedDocument.from_pdf(data, max_pages=DETECTION_PAGES), company_name)
+    EXTRACTION_CACHE.set(key, {"match": list(match) if match else None})
+    return match